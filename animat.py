@@ -1,30 +1,86 @@
+import heapq
 import numpy as np
 import random
+from array import array
 from config import *
+from controller import (CompiledController, NUM_LINKS, FOOD_LEFT, FOOD_RIGHT, WATER_LEFT, WATER_RIGHT,
+                        TRAP_LEFT, TRAP_RIGHT, OTHER_LEFT, OTHER_RIGHT)
+from profiling import profiler
+
+class TrajectoryRecorder:
+    """Records every interval-th animat position, optionally in a fixed-capacity ring buffer"""
+    def __init__(self, interval=1, capacity=None):
+        self.interval = max(1, interval)
+        self.capacity = capacity
+        self.steps = 0
+        self.count = 0
+        if capacity:
+            self.buffer = np.empty((capacity, 2))
+        else:
+            self.buffer = []
+    
+    def record(self, position):
+        """Offer a position; it is stored only on every interval-th call"""
+        if self.steps % self.interval == 0:
+            if self.capacity:
+                self.buffer[self.count % self.capacity] = position
+            else:
+                self.buffer.append(tuple(position))
+            self.count += 1
+        self.steps += 1
+    
+    def points(self):
+        """Get the recorded positions, oldest first, as an (n, 2) array"""
+        if not self.capacity:
+            return np.array(self.buffer, dtype=float).reshape(-1, 2)
+        if self.count <= self.capacity:
+            return self.buffer[:self.count].copy()
+        start = self.count % self.capacity
+        return np.concatenate((self.buffer[start:], self.buffer[:start]))
+    
+    def __len__(self):
+        return min(self.count, self.capacity) if self.capacity else self.count
+    
+    def __iter__(self):
+        return iter(map(tuple, self.points().tolist()))
 
 class Animat:
-    def __init__(self, genome=None, position=None):
-        self.position = position or (random.uniform(0, BASE_ENV_SIZE), random.uniform(0, BASE_ENV_SIZE))
+    """A two-wheeled animat driven by its genome's sensorimotor links.
+
+    State is kept in slots, with the position, last position and sensors in
+    small float arrays that are updated in place every step. Sensors are
+    indexed by the FOOD_LEFT ... OTHER_RIGHT constants, in SENSOR_NAMES order.
+    """
+    __slots__ = ('position', 'angle', 'battery1', 'battery2', 'alive', 'stuck_counter',
+                 'last_position', 'genome', 'controller', 'trajectory', 'sensors')
+    
+    def __init__(self, genome=None, position=None, trajectory=None, controller=None):
+        self.position = array('d', position or (random.uniform(0, BASE_ENV_SIZE), random.uniform(0, BASE_ENV_SIZE)))
         self.angle = random.uniform(0, 2 * np.pi)
         self.battery1 = BATTERY_MAX  # Food battery
         self.battery2 = BATTERY_MAX  # Water battery
         self.alive = True
         self.stuck_counter = 0
-        self.last_position = self.position
-        self.genome = genome or [random.randint(0, 99) for _ in range(GENOME_LENGTH)]
-        self.trajectory = [self.position]
+        self.last_position = array('d', self.position)
+        self.genome = genome if genome is not None else [random.randint(0, 99) for _ in range(GENOME_LENGTH)]
+        # Animats of the same genome may share one controller
+        self.controller = controller if controller is not None else CompiledController(self.genome)
+        # Trajectory recording is off unless a TrajectoryRecorder is given
+        self.trajectory = trajectory
+        if self.trajectory is not None:
+            self.trajectory.record(self.position)
         
         # Initialize sensor values
-        self.sensors = {
-            'food_left': 0, 'food_right': 0,
-            'water_left': 0, 'water_right': 0,
-            'trap_left': 0, 'trap_right': 0,
-            'other_left': 0, 'other_right': 0
-        }
+        self.sensors = array('d', [0.0] * NUM_LINKS)
     
-    def update_sensors(self, env, other_animats=None):
-        """Update sensor values based on environment and other animats"""
+    def update_sensors(self, env, other_animats=None, neighbors=None):
+        """Update sensor values based on environment and other animats.
+
+        Other animats are sensed through a per-step NeighborIndex if one is
+        given, otherwise by scanning the other_animats list.
+        """
         sensor_range = BASE_SENSOR_RANGE * env.num_animats
+        sensors = self.sensors
         
         # Update food sensors
         nearest_food, food_dist = env.get_nearest_object(self.position, 'food')
@@ -34,11 +90,11 @@ class Animat:
             sensor_value = max(0, 100 * (1 - food_dist / sensor_range))
             
             if relative_angle < np.pi:
-                self.sensors['food_left'] = sensor_value * 1.2
-                self.sensors['food_right'] = sensor_value
+                sensors[FOOD_LEFT] = sensor_value * 1.2
+                sensors[FOOD_RIGHT] = sensor_value
             else:
-                self.sensors['food_left'] = sensor_value
-                self.sensors['food_right'] = sensor_value * 1.2
+                sensors[FOOD_LEFT] = sensor_value
+                sensors[FOOD_RIGHT] = sensor_value * 1.2
         
         # Update water sensors (similar to food)
         nearest_water, water_dist = env.get_nearest_object(self.position, 'water')
@@ -48,11 +104,11 @@ class Animat:
             sensor_value = max(0, 100 * (1 - water_dist / sensor_range))
             
             if relative_angle < np.pi:
-                self.sensors['water_left'] = sensor_value * 1.2
-                self.sensors['water_right'] = sensor_value
+                sensors[WATER_LEFT] = sensor_value * 1.2
+                sensors[WATER_RIGHT] = sensor_value
             else:
-                self.sensors['water_left'] = sensor_value
-                self.sensors['water_right'] = sensor_value * 1.2
+                sensors[WATER_LEFT] = sensor_value
+                sensors[WATER_RIGHT] = sensor_value * 1.2
         
         # Update trap sensors
         nearest_trap, trap_dist = env.get_nearest_object(self.position, 'trap')
@@ -62,14 +118,27 @@ class Animat:
             sensor_value = max(0, 100 * (1 - trap_dist / sensor_range))
             
             if relative_angle < np.pi:
-                self.sensors['trap_left'] = sensor_value * 1.2
-                self.sensors['trap_right'] = sensor_value
+                sensors[TRAP_LEFT] = sensor_value * 1.2
+                sensors[TRAP_RIGHT] = sensor_value
             else:
-                self.sensors['trap_left'] = sensor_value
-                self.sensors['trap_right'] = sensor_value * 1.2
+                sensors[TRAP_LEFT] = sensor_value
+                sensors[TRAP_RIGHT] = sensor_value * 1.2
         
         # Update other animat sensors
-        if other_animats:
+        if neighbors is not None:
+            # The nearest animat on each side gives the strongest reading for that side
+            left_dist, right_dist = neighbors.nearest_by_side(self, sensor_range)
+            for dist, on_left in ((left_dist, True), (right_dist, False)):
+                if dist is None:
+                    continue
+                sensor_value = max(0, 100 * (1 - dist / sensor_range))
+                if on_left:
+                    sensors[OTHER_LEFT] = max(sensors[OTHER_LEFT], sensor_value * 1.2)
+                    sensors[OTHER_RIGHT] = max(sensors[OTHER_RIGHT], sensor_value)
+                else:
+                    sensors[OTHER_LEFT] = max(sensors[OTHER_LEFT], sensor_value)
+                    sensors[OTHER_RIGHT] = max(sensors[OTHER_RIGHT], sensor_value * 1.2)
+        elif other_animats:
             for other in other_animats:
                 if other != self and other.alive:
                     dist = np.sqrt((other.position[0] - self.position[0])**2 + 
@@ -81,86 +150,51 @@ class Animat:
                         sensor_value = max(0, 100 * (1 - dist / sensor_range))
                         
                         if relative_angle < np.pi:
-                            self.sensors['other_left'] = max(self.sensors['other_left'], sensor_value * 1.2)
-                            self.sensors['other_right'] = max(self.sensors['other_right'], sensor_value)
+                            sensors[OTHER_LEFT] = max(sensors[OTHER_LEFT], sensor_value * 1.2)
+                            sensors[OTHER_RIGHT] = max(sensors[OTHER_RIGHT], sensor_value)
                         else:
-                            self.sensors['other_left'] = max(self.sensors['other_left'], sensor_value)
-                            self.sensors['other_right'] = max(self.sensors['other_right'], sensor_value * 1.2)
+                            sensors[OTHER_LEFT] = max(sensors[OTHER_LEFT], sensor_value)
+                            sensors[OTHER_RIGHT] = max(sensors[OTHER_RIGHT], sensor_value * 1.2)
     
     def process_sensorimotor_links(self):
-        """Process sensor inputs through the neural network to determine wheel speeds"""
-        left_wheel_sum = 0
-        right_wheel_sum = 0
-        
-        # Process each sensor through its links
-        for i, (sensor_name, sensor_value) in enumerate(self.sensors.items()):
-            # Get the 9 parameters for this sensor's link
-            start_idx = i * 9
-            params = self.genome[start_idx:start_idx + 9]
-            
-            # Calculate the output based on the transfer function
-            output = self._calculate_link_output(sensor_value, params)
-            
-            # Add to appropriate wheel sum
-            if i < 4:  # First 4 sensors go to left wheel
-                left_wheel_sum += output
-            else:  # Last 4 sensors go to right wheel
-                right_wheel_sum += output
-        
-        # Apply sigmoid function and scale to wheel speeds
-        left_speed = self._sigmoid(left_wheel_sum, self.genome[-2])
-        right_speed = self._sigmoid(right_wheel_sum, self.genome[-1])
-        
-        return left_speed, right_speed
-    
-    def _calculate_link_output(self, sensor_value, params):
-        """Calculate the output of a sensorimotor link"""
-        # Extract parameters
-        threshold1 = (params[0] / 99.0) * 200 - 100
-        threshold2 = (params[1] / 99.0) * 200 - 100
-        gradient1 = np.tan((params[2] / 99.0) * np.pi - np.pi/2)
-        gradient2 = np.tan((params[3] / 99.0) * np.pi - np.pi/2)
-        gradient3 = np.tan((params[4] / 99.0) * np.pi - np.pi/2)
-        gradient4 = np.tan((params[5] / 99.0) * np.pi - np.pi/2)
-        
-        # Battery influence parameters
-        slope_mod = params[6] / 99.0
-        offset_mod = params[7] / 99.0
-        battery_choice = params[8]
-        
-        # Calculate base output
-        if sensor_value < threshold1:
-            output = gradient1 * (sensor_value - threshold1)
-        elif sensor_value < threshold2:
-            output = gradient2 * (sensor_value - threshold1)
-        else:
-            output = gradient3 * (sensor_value - threshold2) + gradient4
-        
-        # Apply battery influence
-        battery = self.battery1 if battery_choice % 2 == 0 else self.battery2
-        battery_factor = (battery - 100) / 100.0
-        
-        output = output + output * (battery_factor * slope_mod)
-        output = output + ((battery / 200.0) * offset_mod)
-        
-        return output
+        """Process sensor inputs through the compiled links to determine wheel speeds"""
+        return self.controller.wheel_speeds(self.sensors, self.battery1, self.battery2)
     
-    def _sigmoid(self, x, threshold):
-        """Apply sigmoid function with threshold"""
-        threshold = (threshold / 99.0) * 6 - 3  # Scale threshold to [-3, 3]
-        return 2.0 / (1.0 + np.exp(-(x - threshold))) - 1.0
-    
-    def update(self, env, other_animats=None):
+    def update(self, env, other_animats=None, neighbors=None):
         """Update animat state"""
         if not self.alive:
             return
         
         # Update sensors
-        self.update_sensors(env, other_animats)
+        self.update_sensors(env, other_animats, neighbors)
         
         # Get wheel speeds
         left_speed, right_speed = self.process_sensorimotor_links()
         
+        self.move(env, left_speed, right_speed)
+        self.collide_with_objects(env)
+    
+    def profiled_update(self, env, other_animats=None, neighbors=None):
+        """Update animat state like update(), timing sensing, links and object collisions as profiler phases.
+        
+        Callers pick this method once, when the profiler is enabled, so update()
+        itself carries no profiling cost.
+        """
+        if not self.alive:
+            return
+        
+        with profiler.phase('animat.sensing'):
+            self.update_sensors(env, other_animats, neighbors)
+        
+        with profiler.phase('animat.links'):
+            left_speed, right_speed = self.process_sensorimotor_links()
+        
+        self.move(env, left_speed, right_speed)
+        with profiler.phase('animat.object_collision'):
+            self.collide_with_objects(env)
+    
+    def move(self, env, left_speed, right_speed):
+        """Move by the wheel speeds, turn if stuck, and drain the batteries"""
         # Calculate movement
         speed = (left_speed + right_speed) / 2 * ANIMAT_MAX_SPEED
         rotation = (right_speed - left_speed) * np.pi / 4
@@ -171,23 +205,25 @@ class Animat:
         new_y = self.position[1] + speed * np.sin(self.angle)
         
         # Keep within bounds
-        new_x = max(0, min(env.size, new_x))
-        new_y = max(0, min(env.size, new_y))
-        
-        self.position = (new_x, new_y)
-        self.trajectory.append(self.position)
+        position = self.position
+        position[0] = max(0, min(env.size, new_x))
+        position[1] = max(0, min(env.size, new_y))
+        if self.trajectory is not None:
+            self.trajectory.record(position)
         
         # Check if stuck, if stuck, turn randomly
-        if np.sqrt((self.position[0] - self.last_position[0])**2 + 
-                  (self.position[1] - self.last_position[1])**2) < 0.1:
+        last_position = self.last_position
+        if np.sqrt((position[0] - last_position[0])**2 + 
+                  (position[1] - last_position[1])**2) < 0.1:
             self.stuck_counter += 1
             if self.stuck_counter > STUCK_THRESHOLD:
-                self.angle = random.uniform(0, 2 * np.pi)
+                self.angle = env.turn_angle()
                 self.stuck_counter = 0
         else:
             self.stuck_counter = 0
         
-        self.last_position = self.position
+        last_position[0] = position[0]
+        last_position[1] = position[1]
         
         # Update batteries
         self.battery1 = max(0, self.battery1 - BATTERY_DECAY_RATE)
@@ -196,22 +232,146 @@ class Animat:
         # Check if dead
         if self.battery1 <= 0 and self.battery2 <= 0:
             self.alive = False
-        
-        # Check collisions
+    
+    def collide_with_objects(self, env):
+        """Eat food, drink water or die in a trap the animat touches"""
         for obj_type in ['food', 'water', 'trap']:
-            collided, pos = env.check_collision(self.position, obj_type)
-            if collided:
+            slot = env.collision_slot(self.position, obj_type)
+            if slot is not None:
                 if obj_type == 'trap':
                     self.alive = False
                     self.battery1 = 0
                     self.battery2 = 0
                 elif obj_type == 'food':
                     self.battery1 = BATTERY_MAX
-                    env.replace_object('food', pos)
+                    env.replace_slot('food', slot)
                 elif obj_type == 'water':
                     self.battery2 = BATTERY_MAX
-                    env.replace_object('water', pos)
+                    env.replace_slot('water', slot)
     
     def get_fitness(self):
         """Calculate fitness based on average battery levels"""
-        return (self.battery1 + self.battery2) / (2 * BATTERY_MAX) 
\ No newline at end of file
+        return (self.battery1 + self.battery2) / (2 * BATTERY_MAX) 
+
+class AnimatBatch:
+    """Animats sharing one world, stepped in lockstep.
+
+    Sensing, the sensorimotor links, movement and batteries are computed
+    for all living animats at once, with every animat sensing the objects
+    and the other animats as they were at the start of the step. Stuck
+    turns and object collisions are then resolved animat by animat in list
+    order, against the world as the earlier animats left it, so respawns
+    and random turns happen in the same order as with Animat.update. State
+    stays in the Animat objects, read before and written back after every
+    step.
+    """
+    SENSOR_PAIRS = (('food', FOOD_LEFT, FOOD_RIGHT), ('water', WATER_LEFT, WATER_RIGHT),
+                    ('trap', TRAP_LEFT, TRAP_RIGHT))
+    
+    def __init__(self, animats):
+        self.animats = animats
+        self.controller = CompiledController(np.array([animat.genome for animat in animats], dtype=np.float64))
+    
+    def update(self, env, neighbors):
+        """Advance every living animat by one step, sensing other animats through a NeighborIndex"""
+        rows = np.array([i for i, animat in enumerate(self.animats) if animat.alive], dtype=np.int64)
+        if not len(rows):
+            return
+        living = [self.animats[i] for i in rows.tolist()]
+        positions = np.array([animat.position for animat in living])
+        last_positions = np.array([animat.last_position for animat in living])
+        angle = np.array([animat.angle for animat in living])
+        battery1 = np.array([animat.battery1 for animat in living], dtype=np.float64)
+        battery2 = np.array([animat.battery2 for animat in living], dtype=np.float64)
+        stuck_counter = np.array([animat.stuck_counter for animat in living], dtype=np.int64)
+        sensors = np.zeros((len(self.animats), NUM_LINKS))
+        sensors[rows] = [animat.sensors for animat in living]
+        sensor_range = BASE_SENSOR_RANGE * env.num_animats
+        
+        with profiler.phase('animat.sensing'):
+            for obj_type, left, right in self.SENSOR_PAIRS:
+                slots, dist, dx, dy = env.nearest_objects(positions, obj_type)
+                found = rows[slots >= 0]
+                on_left = ((np.arctan2(dy, dx) - angle) % (2 * np.pi) < np.pi)[slots >= 0]
+                value = np.maximum(0, 100 * (1 - dist / sensor_range))[slots >= 0]
+                sensors[found, left] = np.where(on_left, value * 1.2, value)
+                sensors[found, right] = np.where(on_left, value, value * 1.2)
+            
+            # The nearest animat on each side gives the strongest reading for that side
+            left_dist, right_dist = neighbors.nearest_by_side_batch(rows, positions, angle, sensor_range)
+            with np.errstate(invalid='ignore'):
+                left_value = np.where(np.isnan(left_dist), -np.inf, np.maximum(0, 100 * (1 - left_dist / sensor_range)))
+                right_value = np.where(np.isnan(right_dist), -np.inf, np.maximum(0, 100 * (1 - right_dist / sensor_range)))
+            sensors[rows, OTHER_LEFT] = np.maximum.reduce([sensors[rows, OTHER_LEFT], left_value * 1.2, right_value])
+            sensors[rows, OTHER_RIGHT] = np.maximum.reduce([sensors[rows, OTHER_RIGHT], left_value, right_value * 1.2])
+        
+        with profiler.phase('animat.links'):
+            all_battery1 = np.zeros(len(self.animats))
+            all_battery2 = np.zeros(len(self.animats))
+            all_battery1[rows] = battery1
+            all_battery2[rows] = battery2
+            left_speed, right_speed = self.controller.wheel_speeds(sensors, all_battery1, all_battery2)
+            left_speed, right_speed = left_speed[rows], right_speed[rows]
+        
+        # Move, keeping within bounds
+        speed = (left_speed + right_speed) / 2 * ANIMAT_MAX_SPEED
+        rotation = (right_speed - left_speed) * np.pi / 4
+        angle = (angle + rotation) % (2 * np.pi)
+        x = np.maximum(0, np.minimum(env.size, positions[:, 0] + speed * np.cos(angle)))
+        y = np.maximum(0, np.minimum(env.size, positions[:, 1] + speed * np.sin(angle)))
+        
+        # Stuck animats turn once the counter passes the threshold
+        stuck = np.sqrt((x - last_positions[:, 0])**2 + (y - last_positions[:, 1])**2) < 0.1
+        stuck_counter = np.where(stuck, stuck_counter + 1, 0)
+        turning = stuck_counter > STUCK_THRESHOLD
+        stuck_counter[turning] = 0
+        
+        battery1 = np.maximum(0, battery1 - BATTERY_DECAY_RATE)
+        battery2 = np.maximum(0, battery2 - BATTERY_DECAY_RATE)
+        alive = ~((battery1 <= 0) & (battery2 <= 0))
+        
+        for animat, *state in zip(living, x.tolist(), y.tolist(), angle.tolist(), stuck_counter.tolist(),
+                                  battery1.tolist(), battery2.tolist(), alive.tolist(), sensors[rows].tolist()):
+            new_x, new_y, animat.angle, animat.stuck_counter, animat.battery1, animat.battery2, animat.alive, values = state
+            animat.position[0] = animat.last_position[0] = new_x
+            animat.position[1] = animat.last_position[1] = new_y
+            animat.sensors[:] = array('d', values)
+            if animat.trajectory is not None:
+                animat.trajectory.record(animat.position)
+        
+        with profiler.phase('animat.object_collision'):
+            self.resolve_events(env, living, np.column_stack((x, y)), turning)
+    
+    def resolve_events(self, env, living, positions, turning):
+        """Turn stuck animats and apply object collisions, animat by animat in list order"""
+        pending = set(np.flatnonzero(turning).tolist())
+        for obj_type in ('food', 'water', 'trap'):
+            pending.update(np.flatnonzero(env.collision_slots(positions, obj_type) >= 0).tolist())
+        queue = sorted(pending)
+        heapq.heapify(queue)
+        reach_sq = (SOURCE_SIZE + ANIMAT_SIZE)**2
+        while queue:
+            k = heapq.heappop(queue)
+            if queue and queue[0] == k:
+                continue
+            animat = living[k]
+            if turning[k]:
+                animat.angle = env.turn_angle()
+            for obj_type in ('food', 'water', 'trap'):
+                slot = env.collision_slot(animat.position, obj_type)
+                if slot is None:
+                    continue
+                if obj_type == 'trap':
+                    animat.alive = False
+                    animat.battery1 = 0
+                    animat.battery2 = 0
+                    continue
+                if obj_type == 'food':
+                    animat.battery1 = BATTERY_MAX
+                else:
+                    animat.battery2 = BATTERY_MAX
+                new_position = env.replace_slot(obj_type, slot)
+                # The respawned object may land on an animat that has not been resolved yet
+                landed = np.flatnonzero(((positions - np.asarray(new_position))**2).sum(axis=1) < reach_sq)
+                for j in landed[landed > k].tolist():
+                    heapq.heappush(queue, j)
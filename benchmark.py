@@ -0,0 +1,204 @@
+"""Reproducible benchmarks for the simulation hot paths.
+
+Usage:
+    python benchmark.py [--benchmarks animat spatial fitness evolve] [--seed 0]
+                        [--scales 1 10 100] [--spatial-scales 1 10 100 1000]
+                        [--population-sizes 100 1000] [--backend serial]
+                        [--output results.json] [--compare baseline.json]
+
+Every benchmark reseeds the random generators, so two runs on the same
+machine simulate exactly the same work. Results are emitted as JSON, one
+record per (benchmark, parameters) pair. With --compare, per-call latencies
+are checked against a previous results file and the exit status is non-zero
+if any of them regressed by more than --tolerance.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+import warnings
+import numpy as np
+from config import *
+from animat import Animat, AnimatBatch
+from environment import Environment
+from genetic import GeneticAlgorithm
+from main import create_animats, simulation_step
+from spatial import NeighborIndex
+
+def time_calls(func, args_list):
+    """Call func once per argument tuple and report per-call latency and throughput"""
+    start = time.perf_counter()
+    for args in args_list:
+        func(*args)
+    elapsed = time.perf_counter() - start
+    calls = len(args_list)
+    return {
+        'calls': calls,
+        'total_s': elapsed,
+        'per_call_us': elapsed / calls * 1e6,
+        'calls_per_s': calls / elapsed if elapsed > 0 else float('inf')
+    }
+
+def _seed(seed):
+    """Reset every random generator the simulation uses"""
+    random.seed(seed)
+    np.random.seed(seed)
+
+def _brute_force_nearest(objects, position):
+    """Reference nearest-object query scanning every object, as before the spatial index"""
+    distances = [np.sqrt((x - position[0])**2 + (y - position[1])**2) for x, y in objects]
+    min_idx = np.argmin(distances)
+    return objects[min_idx], distances[min_idx]
+
+def bench_animat(args):
+    """Per-call cost of the Animat step methods and of a whole simulation step in worlds of num_animats animats"""
+    records = []
+    for num_animats in args.scales:
+        _seed(args.seed)
+        env = Environment(num_animats)
+        # Animats spread over the whole world, as the main loop places them
+        animats = create_animats(env, np.random.randint(0, 100, (num_animats, GENOME_LENGTH)).astype(np.uint8))
+        neighbors = NeighborIndex(animats)
+        rounds = max(1, args.animat_calls // num_animats)
+        calls = [(animat,) for _ in range(rounds) for animat in animats]
+        params = {'num_animats': num_animats}
+
+        records.append(dict(name='animat.update_sensors', params=params,
+                            **time_calls(lambda a: a.update_sensors(env, neighbors=neighbors), calls)))
+        records.append(dict(name='animat.process_sensorimotor_links', params=params,
+                            **time_calls(lambda a: a.process_sensorimotor_links(), calls)))
+
+        # Keep the animats alive so every call does the full amount of work
+        def revive(animat):
+            animat.alive = True
+            animat.battery1 = animat.battery2 = BATTERY_MAX
+        def update(animat):
+            animat.update(env, neighbors=neighbors)
+            revive(animat)
+        records.append(dict(name='animat.update', params=params, **time_calls(update, calls)))
+
+        # The step the main loop runs: every animat at once, then the neighbor index and collision damage
+        batch = AnimatBatch(animats)
+        def step():
+            simulation_step(env, animats, NeighborIndex(animats), batch)
+            for animat in animats:
+                revive(animat)
+        records.append(dict(name='main.simulation_step', params=params, **time_calls(step, [()] * rounds)))
+    return records
+
+def bench_spatial(args):
+    """Per-query cost of Environment nearest-object and collision queries, one batch query and respawns, across world scales"""
+    records = []
+    for num_animats in args.spatial_scales:
+        _seed(args.seed)
+        env = Environment(num_animats)
+        positions = [(random.uniform(0, env.size), random.uniform(0, env.size)) for _ in range(args.queries)]
+        params = {'num_animats': num_animats, 'objects_per_type': env.food_count}
+        records.append(dict(name='environment.get_nearest_object', params=params,
+                            **time_calls(env.get_nearest_object, [(p, 'food') for p in positions])))
+        records.append(dict(name='environment.check_collision', params=params,
+                            **time_calls(env.check_collision, [(p, 'food') for p in positions])))
+        records.append(dict(name='environment.nearest_objects', params=dict(params, batch=len(positions)),
+                            **time_calls(env.nearest_objects, [(positions, 'food')])))
+        records.append(dict(name='reference.brute_force_nearest', params=params,
+                            **time_calls(_brute_force_nearest, [(env.food_sources, p) for p in positions])))
+        # Respawns update the spatial index and the nearest-object field locally; in worlds with fields
+        # this is the cost that pays for the faster get_nearest_object above. Measured on one core:
+        # with fields a read takes about 1.6-3 us at 1 animat (6.9 us on the grid alone) and 7-10 us
+        # at 10 animats (9 us), while a respawn takes about 185-250 us instead of 6-9 us. Over 90% of
+        # the single-animat evaluation world's reads are answered by the field, and fitness evaluation
+        # runs 10-30% faster
+        slots = [(slot % env.food_count,) for slot in range(args.queries)]
+        records.append(dict(name='environment.replace_slot', params=params,
+                            **time_calls(lambda slot: env.replace_slot('food', slot), slots)))
+    return records
+
+def bench_fitness(args):
+    """Per-genome cost of GeneticAlgorithm.evaluate_fitness"""
+    _seed(args.seed)
+    ga = GeneticAlgorithm(backend=args.backend, population_size=args.fitness_calls)
+    ga.initialize_population()
+    record = dict(name='genetic.evaluate_fitness', params={},
+                  **time_calls(ga.evaluate_fitness, [(genome,) for genome in ga.population]))
+    ga.close()
+    return [record]
+
+def bench_evolve(args):
+    """Cost of one full evolve() call for each population size"""
+    records = []
+    for population_size in args.population_sizes:
+        _seed(args.seed)
+        ga = GeneticAlgorithm(backend=args.backend, population_size=population_size)
+        ga.initialize_population()
+        timing = time_calls(ga.evolve, [()])
+        timing['genomes_per_s'] = population_size / timing['total_s']
+        records.append(dict(name='genetic.evolve', params={'population_size': population_size,
+                                                           'backend': ga.backend}, **timing))
+        ga.close()
+    return records
+
+BENCHMARKS = {
+    'animat': bench_animat,
+    'spatial': bench_spatial,
+    'fitness': bench_fitness,
+    'evolve': bench_evolve
+}
+
+def _record_key(record):
+    return record['name'], json.dumps(record['params'], sort_keys=True)
+
+def compare(results, baseline, tolerance):
+    """Print per-call latency ratios against a baseline and return the regressed records"""
+    previous = {_record_key(r): r for r in baseline['records']}
+    regressions = []
+    for record in results['records']:
+        old = previous.get(_record_key(record))
+        if old is None:
+            continue
+        ratio = record['per_call_us'] / old['per_call_us']
+        print(f"{record['name']:40s} {json.dumps(record['params'], sort_keys=True):50s} x{ratio:.2f}",
+              file=sys.stderr)
+        if ratio > 1 + tolerance:
+            regressions.append(record)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the animat simulation hot paths")
+    parser.add_argument('--benchmarks', nargs='+', choices=list(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--scales', nargs='+', type=int, default=[1, 10, 100],
+                        help="num_animats values for the animat benchmark")
+    parser.add_argument('--spatial-scales', nargs='+', type=int, default=[1, 10, 100, 1000],
+                        help="num_animats values for the spatial benchmark")
+    parser.add_argument('--population-sizes', nargs='+', type=int, default=[100, 1000],
+                        help="Population sizes for the evolve benchmark")
+    parser.add_argument('--backend', choices=['serial', 'vectorized', 'process'], default=EVALUATION_BACKEND)
+    parser.add_argument('--animat-calls', type=int, default=2000, help="Calls per animat benchmark")
+    parser.add_argument('--queries', type=int, default=2000, help="Queries per spatial benchmark")
+    parser.add_argument('--fitness-calls', type=int, default=20, help="Genomes for the fitness benchmark")
+    parser.add_argument('--output', help="Also write the JSON results to this file")
+    parser.add_argument('--compare', help="Baseline JSON results to compare per-call latency against")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="Allowed relative slowdown before --compare reports a regression")
+    args = parser.parse_args()
+    warnings.simplefilter('ignore', RuntimeWarning)
+
+    results = {'seed': args.seed, 'backend': args.backend, 'records': []}
+    for name in args.benchmarks:
+        results['records'].extend(BENCHMARKS[name](args))
+
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
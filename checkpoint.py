@@ -0,0 +1,154 @@
+import json
+import os
+import random
+import numpy as np
+from config import *
+
+def checkpoint_state(ga):
+    """Copy the population, NumPy generator state, generation counter and histories a checkpoint holds.
+
+    The copy can be written later by save_checkpoint, e.g. from another
+    thread while the GeneticAlgorithm moves on to the next generation.
+    """
+    return {
+        'population': np.asarray(ga.population, dtype=np.uint8).copy(),
+        'generation': np.int64(ga.generation),
+        'best_fitness_history': np.asarray(ga.best_fitness_history, dtype=np.float64),
+        'avg_fitness_history': np.asarray(ga.avg_fitness_history, dtype=np.float64),
+        'min_fitness_history': np.asarray(ga.min_fitness_history, dtype=np.float64),
+        'estimated_history': np.asarray(ga.estimated_history, dtype=np.int64),
+        'rng_state': np.array(json.dumps(ga.rng.bit_generator.state))
+    }
+
+def save_checkpoint(path, ga, env=None, state=None):
+    """Write the population, RNG states, generation counter and histories to a compressed .npz file.
+
+    If env is given, its object positions are saved too, so a resumed run
+    continues in the same world. A state from checkpoint_state() is written
+    instead of ga's current one if given; the random module's state is
+    always taken now.
+    """
+    if state is None:
+        state = checkpoint_state(ga)
+    random_state = random.getstate()
+    objects = {}
+    if env is not None:
+        objects = {
+            'food_sources': np.asarray(env.food_sources, dtype=np.float64).reshape(-1, 2),
+            'water_sources': np.asarray(env.water_sources, dtype=np.float64).reshape(-1, 2),
+            'traps': np.asarray(env.traps, dtype=np.float64).reshape(-1, 2)
+        }
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez_compressed(
+            f,
+            random_state=np.array(json.dumps([random_state[0], list(random_state[1]), random_state[2]])),
+            **state,
+            **objects
+        )
+    # Replace the previous checkpoint only once the new one is complete
+    os.replace(tmp_path, path)
+
+def load_checkpoint(path, ga, env=None):
+    """Restore a GeneticAlgorithm, the random module and optionally an Environment from a checkpoint"""
+    with np.load(path, allow_pickle=False) as data:
+        ga.population = data['population'].copy()
+        ga.population_size = len(ga.population)
+        ga.generation = int(data['generation'])
+        ga.best_fitness_history = data['best_fitness_history'].tolist()
+        ga.avg_fitness_history = data['avg_fitness_history'].tolist()
+        ga.min_fitness_history = data['min_fitness_history'].tolist()
+        # Checkpoints from before successive halving was flagged have no estimate counts
+        ga.estimated_history = (data['estimated_history'].tolist() if 'estimated_history' in data
+                                else [0] * len(ga.best_fitness_history))
+        ga.rng.bit_generator.state = json.loads(str(data['rng_state']))
+        version, internal_state, gauss_next = json.loads(str(data['random_state']))
+        random.setstate((version, tuple(internal_state), gauss_next))
+        if env is not None and 'food_sources' in data:
+            env.food_sources = data['food_sources'].copy()
+            env.water_sources = data['water_sources'].copy()
+            env.traps = data['traps'].copy()
+            env.build_indexes()
+    ga.fitness_cache.clear()
+
+class GenerationArchive:
+    """Append-only archive of every generation's genomes and fitnesses.
+
+    Genomes are stored as raw uint8 rows in genomes.u8, fitnesses as float64
+    in fitness.f8, and generations.i8 holds one (generation, first row, rows)
+    triple per generation. The index is written last, so rows left behind by
+    a crash are ignored and overwritten on the next append. All three files
+    can be memory-mapped to analyze lineages larger than RAM.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.genomes_path = os.path.join(directory, 'genomes.u8')
+        self.fitness_path = os.path.join(directory, 'fitness.f8')
+        self.index_path = os.path.join(directory, 'generations.i8')
+        self.index = self._read_index()
+        self._truncate_data()
+
+    def _read_index(self):
+        """Read the (generation, first row, rows) index, dropping a partially written entry"""
+        if not os.path.exists(self.index_path):
+            return np.empty((0, 3), dtype=np.int64)
+        raw = np.fromfile(self.index_path, dtype=np.int64)
+        return raw[:len(raw) // 3 * 3].reshape(-1, 3)
+
+    def _truncate_data(self):
+        """Cut every file back to what the index covers"""
+        rows = int(self.index[-1, 1] + self.index[-1, 2]) if len(self.index) else 0
+        for path, itemsize in ((self.genomes_path, GENOME_LENGTH), (self.fitness_path, 8)):
+            with open(path, 'ab') as f:
+                f.truncate(rows * itemsize)
+        with open(self.index_path, 'ab') as f:
+            f.truncate(self.index.nbytes)
+
+    def append(self, generation, genomes, fitnesses):
+        """Append one generation's genomes and fitnesses"""
+        genomes = np.ascontiguousarray(genomes, dtype=np.uint8)
+        fitnesses = np.ascontiguousarray(fitnesses, dtype=np.float64)
+        first_row = self.rows
+        with open(self.genomes_path, 'ab') as f:
+            f.write(genomes.tobytes())
+        with open(self.fitness_path, 'ab') as f:
+            f.write(fitnesses.tobytes())
+
+        entry = np.array([[generation, first_row, len(genomes)]], dtype=np.int64)
+        with open(self.index_path, 'ab') as f:
+            f.write(entry.tobytes())
+        self.index = np.concatenate((self.index, entry))
+
+    def truncate(self, generation):
+        """Drop every generation from this one onwards, e.g. before resuming from a checkpoint"""
+        self.index = self.index[self.index[:, 0] < generation]
+        self._truncate_data()
+
+    @property
+    def rows(self):
+        """Total number of archived genomes"""
+        return int(self.index[-1, 1] + self.index[-1, 2]) if len(self.index) else 0
+
+    def __len__(self):
+        return len(self.index)
+
+    def genomes(self):
+        """Memory-map every archived genome as a read-only (rows, GENOME_LENGTH) array"""
+        if self.rows == 0:
+            return np.empty((0, GENOME_LENGTH), dtype=np.uint8)
+        return np.memmap(self.genomes_path, dtype=np.uint8, mode='r', shape=(self.rows, GENOME_LENGTH))
+
+    def fitnesses(self):
+        """Memory-map every archived fitness as a read-only array"""
+        if self.rows == 0:
+            return np.empty(0, dtype=np.float64)
+        return np.memmap(self.fitness_path, dtype=np.float64, mode='r', shape=(self.rows,))
+
+    def generation(self, generation):
+        """Get the memory-mapped genomes and fitnesses of one generation"""
+        match = np.flatnonzero(self.index[:, 0] == generation)
+        if not len(match):
+            raise KeyError(f"Generation {generation} is not archived")
+        _, first_row, rows = self.index[match[-1]]
+        return self.genomes()[first_row:first_row + rows], self.fitnesses()[first_row:first_row + rows]
@@ -5,6 +5,19 @@ BASE_FOOD_COUNT = 3
 BASE_WATER_COUNT = 3
 BASE_TRAP_COUNT = 3
 
+# Nearest-object fields: a raster of the nearest objects to every cell centre,
+# so most sensor reads are one cell lookup plus one distance check. Objects
+# farther than NEAREST_FIELD_RADIUS from a cell are left out of it. Worlds that
+# would need more than NEAREST_FIELD_MAX_CELLS cells use only the spatial grid.
+# A cell size of 0 disables the fields
+NEAREST_FIELD_CELL = 6.0
+NEAREST_FIELD_RADIUS = 150
+NEAREST_FIELD_MAX_CELLS = 1 << 18
+
+MAX_ANIMATS = 2000  # Upper bound for the interactive animat prompt
+MAX_WINDOW_SIZE = 800  # Larger worlds are drawn scaled down to this many pixels
+BATCH_MIN_ANIMATS = 32  # Worlds with at least this many animats step them all at once with NumPy
+
 # Animat constants
 ANIMAT_SIZE = 5
 SOURCE_SIZE = 16
@@ -16,6 +29,8 @@ BATTERY_DECAY_RATE = 0.5 # Battery decay per time step, half of the original val
 ANIMAT_MAX_LIFESPAN = 800
 STUCK_THRESHOLD = 30  # Time steps before random movement
 COLLISION_DAMAGE = 10  # Battery damage when animats collide
+TRAJECTORY_INTERVAL = 1  # Record every n-th position of displayed animats
+TRAJECTORY_CAPACITY = ANIMAT_MAX_LIFESPAN + 1  # Ring buffer size for displayed trajectories
 
 # Simulation speed control
 SIMULATION_SPEED = 1  # Speed multiplier
@@ -28,6 +43,73 @@ POPULATION_SIZE = 100
 CROSSOVER_RATE = 0.5
 MUTATION_RATE = 0.01
 GENOME_LENGTH = 83  # 9 links * 9 parameters + 2 sigmoid thresholds
+TOURNAMENT_SIZE = 7
+ELITE_COUNT = 5
+
+# 'generational' replaces the whole population but the elites every generation;
+# 'steady_state' breeds STEADY_STATE_BATCH offspring per iteration and has them
+# replace the worst members, so only the offspring are evaluated
+GA_MODE = 'generational'
+STEADY_STATE_BATCH = 10
+
+# Fitness evaluation backend: 'serial' steps one Animat at a time,
+# 'vectorized' steps the whole population in lockstep with NumPy,
+# 'process' spreads serial simulations across a process pool
+EVALUATION_BACKEND = 'serial'
+
+# Successive-halving evaluation: every genome is first simulated for the first
+# horizon, and only the best HALVING_PROMOTE share of the survivors continues
+# to the next one and finally to ANIMAT_MAX_LIFESPAN. Empty disables it.
+HALVING_RUNGS = ()  # e.g. (100, 300)
+HALVING_PROMOTE = 0.25
+
+# Seeded layouts: every genome of a generation is evaluated on the same
+# LAYOUT_COUNT worlds (objects, animat start and respawn positions), drawn once
+# per generation (once per run in steady-state mode), and scored by its mean
+# fitness over them. 0 gives every evaluation a fresh random world
+LAYOUT_COUNT = 0
+
+# Process pool constants
+PARALLEL_WORKERS = 0  # Number of worker processes, 0 uses every core
+PARALLEL_CHUNKSIZE = 4  # Genomes sent to a worker per task
+PARALLEL_START_METHOD = 'spawn'
+
+# Island model: ISLAND_COUNT sub-populations of POPULATION_SIZE // ISLAND_COUNT genomes,
+# each in its own process, that send their MIGRATION_COUNT best genomes to their
+# neighbours every MIGRATION_INTERVAL generations
+ISLAND_COUNT = 4
+MIGRATION_INTERVAL = 5
+MIGRATION_COUNT = 2
+MIGRATION_TOPOLOGY = 'ring'  # 'ring', 'random' or 'fully_connected'
+
+# Surrogate pre-screening: breed SURROGATE_OVERSAMPLE times more children than
+# needed, rank them with a ridge regression of fitness on the genes and only
+# keep the best predicted ones, plus a SURROGATE_RANDOM_SHARE picked at random
+SURROGATE_ENABLED = False
+SURROGATE_OVERSAMPLE = 4
+SURROGATE_RANDOM_SHARE = 0.2
+SURROGATE_ALPHA = 1.0  # Ridge regularization strength
+# Rank correlation with the simulated fitnesses the model must beat before it
+# screens; about three standard errors of chance for ~100 children. Below it
+# children are picked at random
+SURROGATE_MIN_ACCURACY = 0.3
+
+# Record a replayable log of each generation's best fitness run
+RECORD_RUNS = False
+
+# Telemetry: headless runs stream each generation's statistics, these
+# quantiles of its fitnesses and timings to <output>/statistics.csv (or
+# .jsonl), flushing the buffered records at most every TELEMETRY_FLUSH_SECONDS
+TELEMETRY_FORMAT = 'csv'
+TELEMETRY_QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+TELEMETRY_FLUSH_SECONDS = 1.0
+
+# Generations the background evolution may run ahead of the display
+PIPELINE_QUEUE_SIZE = 2
+
+# Fitness cache constants
+FITNESS_CACHE_MODE = 'generation'  # 'generation' clears every evolve(), 'lru' keeps entries across generations
+FITNESS_CACHE_SIZE = 10000  # Maximum number of genomes kept in 'lru' mode
 
 # Visualization constants
 WINDOW_TITLE = "Animat Simulation"
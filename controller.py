@@ -0,0 +1,132 @@
+import math
+import numpy as np
+
+# Fixed sensor order: the i-th sensor feeds the i-th sensorimotor link
+SENSOR_NAMES = (
+    'food_left', 'food_right',
+    'water_left', 'water_right',
+    'trap_left', 'trap_right',
+    'other_left', 'other_right'
+)
+NUM_LINKS = len(SENSOR_NAMES)
+
+# Positions of the sensors in a sensor vector
+FOOD_LEFT, FOOD_RIGHT, WATER_LEFT, WATER_RIGHT, TRAP_LEFT, TRAP_RIGHT, OTHER_LEFT, OTHER_RIGHT = range(NUM_LINKS)
+LINK_PARAMS = 9
+GENE_VALUES = 100
+
+def _gene_tables():
+    """Decode every gene value 0-99 once into each kind of link parameter"""
+    genes = np.arange(GENE_VALUES, dtype=np.float64)
+    threshold = (genes / 99.0) * 200 - 100
+    gradient = np.tan((genes / 99.0) * np.pi - np.pi/2)
+    fraction = genes / 99.0
+    sigmoid = (genes / 99.0) * 6 - 3
+    return tuple(tuple(table.tolist()) for table in (threshold, gradient, fraction, sigmoid))
+
+# Shared Python floats for the single genome links, so controllers reference them instead of allocating their own
+_THRESHOLDS, _GRADIENTS, _FRACTIONS, _SIGMOIDS = _gene_tables()
+
+class CompiledController:
+    """Sensorimotor links of a genome, decoded once into flat parameter arrays.
+
+    The genome may also be a (N, GENOME_LENGTH) matrix, in which case every
+    parameter array gets a leading population axis and wheel_speeds() evaluates
+    all N controllers at once. A single genome is evaluated in a plain Python
+    loop over the same parameters, which beats NumPy on 8-element vectors, and
+    keeps only the per-link tuples, since every animat holds one.
+    """
+    __slots__ = ('threshold1', 'threshold2', 'gradient1', 'gradient2', 'gradient3', 'gradient4',
+                 'slope_mod', 'offset_mod', 'uses_battery1', 'sigmoid_left', 'sigmoid_right',
+                 'links', 'sigmoid_thresholds')
+
+    def __init__(self, genome):
+        genes = np.asarray(genome)
+        if genes.ndim == 1:
+            self._compile_single(genes.astype(np.intp).tolist())
+            return
+        genes = genes.astype(np.float64)
+        links = genes[..., :NUM_LINKS * LINK_PARAMS].reshape(genes.shape[:-1] + (NUM_LINKS, LINK_PARAMS))
+
+        # Transfer function thresholds and gradients
+        self.threshold1 = (links[..., 0] / 99.0) * 200 - 100
+        self.threshold2 = (links[..., 1] / 99.0) * 200 - 100
+        self.gradient1 = np.tan((links[..., 2] / 99.0) * np.pi - np.pi/2)
+        self.gradient2 = np.tan((links[..., 3] / 99.0) * np.pi - np.pi/2)
+        self.gradient3 = np.tan((links[..., 4] / 99.0) * np.pi - np.pi/2)
+        self.gradient4 = np.tan((links[..., 5] / 99.0) * np.pi - np.pi/2)
+
+        # Battery influence parameters
+        self.slope_mod = links[..., 6] / 99.0
+        self.offset_mod = links[..., 7] / 99.0
+        self.uses_battery1 = links[..., 8] % 2 == 0
+
+        # Sigmoid thresholds scaled to [-3, 3]
+        self.sigmoid_left = (genes[..., -2] / 99.0) * 6 - 3
+        self.sigmoid_right = (genes[..., -1] / 99.0) * 6 - 3
+        self.links = None
+
+    def _compile_single(self, genes):
+        """Decode one genome into per-link parameter tuples of the shared decoded floats"""
+        links = []
+        for start in range(0, NUM_LINKS * LINK_PARAMS, LINK_PARAMS):
+            t1, t2, g1, g2, g3, g4, slope, offset, battery = genes[start:start + LINK_PARAMS]
+            links.append((_THRESHOLDS[t1], _THRESHOLDS[t2],
+                          _GRADIENTS[g1], _GRADIENTS[g2], _GRADIENTS[g3], _GRADIENTS[g4],
+                          _FRACTIONS[slope], _FRACTIONS[offset], battery % 2 == 0))
+        self.links = tuple(links)
+        self.sigmoid_thresholds = (_SIGMOIDS[genes[-2]], _SIGMOIDS[genes[-1]])
+
+    def link_outputs(self, sensors, battery1, battery2):
+        """Get the output of every link of a stacked controller for sensor vectors in SENSOR_NAMES order"""
+        s = np.asarray(sensors, dtype=np.float64)
+        output = np.where(s < self.threshold1, self.gradient1 * (s - self.threshold1),
+                          np.where(s < self.threshold2, self.gradient2 * (s - self.threshold1),
+                                   self.gradient3 * (s - self.threshold2) + self.gradient4))
+
+        battery = np.where(self.uses_battery1, np.asarray(battery1)[..., None], np.asarray(battery2)[..., None])
+        battery_factor = (battery - 100) / 100.0
+        output = output + output * (battery_factor * self.slope_mod)
+        return output + ((battery / 200.0) * self.offset_mod)
+
+    def wheel_speeds(self, sensors, battery1, battery2):
+        """Get the left and right wheel speeds for a sensor vector in SENSOR_NAMES order"""
+        if self.links is not None:
+            return self._single_wheel_speeds(sensors, battery1, battery2)
+        output = self.link_outputs(sensors, battery1, battery2)
+
+        # First 4 links drive the left wheel, last 4 the right wheel
+        left_sum = output[..., 0] + output[..., 1] + output[..., 2] + output[..., 3]
+        right_sum = output[..., 4] + output[..., 5] + output[..., 6] + output[..., 7]
+        with np.errstate(over='ignore'):
+            left_speed = 2.0 / (1.0 + np.exp(-(left_sum - self.sigmoid_left))) - 1.0
+            right_speed = 2.0 / (1.0 + np.exp(-(right_sum - self.sigmoid_right))) - 1.0
+        return left_speed, right_speed
+
+    def _single_wheel_speeds(self, sensors, battery1, battery2):
+        """Evaluate both wheel speeds of a single genome in one pass over its links"""
+        wheel_sums = [0.0, 0.0]
+        for i, (sensor_value, link) in enumerate(zip(sensors, self.links)):
+            threshold1, threshold2, gradient1, gradient2, gradient3, gradient4, slope_mod, offset_mod, uses_battery1 = link
+            if sensor_value < threshold1:
+                output = gradient1 * (sensor_value - threshold1)
+            elif sensor_value < threshold2:
+                output = gradient2 * (sensor_value - threshold1)
+            else:
+                output = gradient3 * (sensor_value - threshold2) + gradient4
+
+            battery = battery1 if uses_battery1 else battery2
+            output = output + output * (((battery - 100) / 100.0) * slope_mod)
+            output = output + ((battery / 200.0) * offset_mod)
+
+            # First 4 links drive the left wheel, last 4 the right wheel
+            wheel_sums[i >= 4] += output
+
+        return tuple(_sigmoid(x, threshold) for x, threshold in zip(wheel_sums, self.sigmoid_thresholds))
+
+def _sigmoid(x, threshold):
+    """Apply the wheel sigmoid, saturating instead of overflowing math.exp"""
+    z = -(x - threshold)
+    if z > 700:
+        return -1.0
+    return 2.0 / (1.0 + math.exp(z)) - 1.0
@@ -1,80 +1,229 @@
 import numpy as np
 import random
 from config import *
+from spatial import CellTable, SpatialGrid, NearestField
+from profiling import profiler
 
 class Environment:
-    def __init__(self, num_animats=1):
+    def __init__(self, num_animats=1, layout=None):
         self.num_animats = num_animats
         self.size = BASE_ENV_SIZE * num_animats
         self.food_count = BASE_FOOD_COUNT * num_animats
         self.water_count = BASE_WATER_COUNT * num_animats
         self.trap_count = BASE_TRAP_COUNT * num_animats
         
-        # Initialize objects
-        self.food_sources = []
-        self.water_sources = []
-        self.traps = []
-        self.reset_objects()
+        # Object positions, one (count, 2) array per type; consumed objects respawn in their slot
+        self.food_sources = np.empty((0, 2))
+        self.water_sources = np.empty((0, 2))
+        self.traps = np.empty((0, 2))
+        self.indexes = {}
+        self.fields = {}  # Optional NearestField per object type, answering most nearest-object queries
+        self.version = 0  # Bumped whenever an object is added, moved or removed
+        self.tables = {}  # CellTable per object type for batch queries, valid while the version is tables_version
+        self.tables_version = None
+        self.recorder = None  # Optional SimulationLog receiving every respawn
+        self.layout = None  # Optional Layout fixing the starting objects, respawn positions and turns
+        self.respawned = {}
+        self.turned = 0
+        if layout is not None:
+            self.load_layout(layout)
+        else:
+            self.reset_objects()
     
     def reset_objects(self):
         """Reset all objects to random positions"""
         self.food_sources = self._generate_objects(self.food_count)
         self.water_sources = self._generate_objects(self.water_count)
         self.traps = self._generate_objects(self.trap_count)
+        self.build_indexes()
+    
+    def load_layout(self, layout):
+        """Place the objects of a Layout and respawn consumed ones at its positions, in order.
+        
+        The layout's spatial indexes and nearest-object fields are built by the
+        first Environment that loads it and copied by the others.
+        """
+        self.layout = layout
+        self.respawned = {obj_type: 0 for obj_type in layout.respawns}
+        self.turned = 0
+        self.food_sources = layout.objects['food'].copy()
+        self.water_sources = layout.objects['water'].copy()
+        self.traps = layout.objects['trap'].copy()
+        if layout.indexes is None:
+            self.build_indexes()
+            layout.indexes = {object_type: index.copy() for object_type, index in self.indexes.items()}
+            layout.fields = {object_type: field.copy() for object_type, field in self.fields.items()}
+        else:
+            self.version += 1
+            self.indexes = {object_type: index.copy() for object_type, index in layout.indexes.items()}
+            self.fields = {object_type: field.copy() for object_type, field in layout.fields.items()}
+    
+    def build_indexes(self):
+        """Rebuild the spatial index and nearest-object field of every object type from the object lists"""
+        self.version += 1
+        self.indexes = {}
+        self.fields = {}
+        # Coarser cells would rarely answer, so large worlds only get the grid
+        use_fields = NEAREST_FIELD_CELL and (self.size / NEAREST_FIELD_CELL)**2 <= NEAREST_FIELD_MAX_CELLS
+        for object_type in ('food', 'water', 'trap'):
+            objects = self._get_objects(object_type)
+            # Aim for about one object per cell, but never cells smaller than a collision
+            cell_size = max(SOURCE_SIZE + ANIMAT_SIZE, self.size / max(1, len(objects))**0.5)
+            index = SpatialGrid(self.size, cell_size)
+            for i, pos in enumerate(objects.tolist()):
+                index.insert(i, tuple(pos))
+            self.indexes[object_type] = index
+            if use_fields:
+                self.fields[object_type] = NearestField(self.size, NEAREST_FIELD_CELL, NEAREST_FIELD_RADIUS,
+                                                        objects.tolist())
+    
+    def _get_objects(self, object_type):
+        """Get the object list of a type, or None for unknown types"""
+        if object_type == 'food':
+            return self.food_sources
+        elif object_type == 'water':
+            return self.water_sources
+        elif object_type == 'trap':
+            return self.traps
+        return None
+    
+    def _random_position(self):
+        """Draw a random object position inside the placement padding"""
+        x = random.uniform(OBJECT_PLACEMENT_PADDING, self.size - OBJECT_PLACEMENT_PADDING)
+        y = random.uniform(OBJECT_PLACEMENT_PADDING, self.size - OBJECT_PLACEMENT_PADDING)
+        return x, y
     
     def _generate_objects(self, count):
-        """Generate random positions for objects"""
-        objects = []
-        for _ in range(count):
-            x = random.uniform(OBJECT_PLACEMENT_PADDING, self.size - OBJECT_PLACEMENT_PADDING)
-            y = random.uniform(OBJECT_PLACEMENT_PADDING, self.size - OBJECT_PLACEMENT_PADDING)
-            objects.append((x, y))
-        return objects
+        """Generate random positions for objects as a (count, 2) array"""
+        return np.array([self._random_position() for _ in range(count)], dtype=np.float64).reshape(count, 2)
+    
+    def _respawn_position(self, object_type):
+        """Get the position of the next respawned object of a type: the layout's next one, or a random one"""
+        if self.layout is None:
+            return self._random_position()
+        positions = self.layout.respawns[object_type]
+        count = self.respawned[object_type]
+        self.respawned[object_type] = count + 1
+        return tuple(positions[count % len(positions)].tolist())
+    
+    def turn_angle(self):
+        """Get the angle a stuck animat turns to: the layout's next one, or a random one"""
+        if self.layout is None:
+            return random.uniform(0, 2 * np.pi)
+        angles = self.layout.turns
+        count = self.turned
+        self.turned = count + 1
+        return float(angles[count % len(angles)])
+    
+    def replace_slot(self, object_type, slot):
+        """Respawn the object in a slot at a new position, in place, and return that position"""
+        objects = self._get_objects(object_type)
+        if (objects is None or isinstance(slot, bool) or not isinstance(slot, (int, np.integer))
+                or not 0 <= slot < len(objects)):
+            raise ValueError(f"No {object_type} object in slot {slot!r}")
+        slot = int(slot)
+        new_pos = self._respawn_position(object_type)
+        objects[slot] = new_pos
+        self.indexes[object_type].move(slot, new_pos)
+        if object_type in self.fields:
+            self.fields[object_type].move(slot, new_pos)
+        self.version += 1
+        if self.recorder is not None:
+            self.recorder.record_respawn(object_type, slot, new_pos)
+        return new_pos
     
     def replace_object(self, object_type, position):
         """Replace a consumed object with a new one at a random position"""
-        new_pos = self._generate_objects(1)[0]
-        if object_type == 'food':
-            self.food_sources.remove(position)
-            self.food_sources.append(new_pos)
-        elif object_type == 'water':
-            self.water_sources.remove(position)
-            self.water_sources.append(new_pos)
+        if object_type not in ('food', 'water'):
+            return
+        slot = self.indexes[object_type].find(tuple(position))
+        if slot is None:
+            raise ValueError(f"No {object_type} object at {tuple(position)}")
+        self.replace_slot(object_type, slot)
     
     def get_nearest_object(self, position, object_type):
         """Get the nearest object of specified type and its distance"""
-        if object_type == 'food':
-            objects = self.food_sources
-        elif object_type == 'water':
-            objects = self.water_sources
-        elif object_type == 'trap':
-            objects = self.traps
-        else:
+        index = self.indexes.get(object_type)
+        if index is None or not index.positions:
             return None, float('inf')
         
-        if not objects:
-            return None, float('inf')
+        # The field answers unless the query is too close to a boundary between two objects' regions
+        field = self.fields.get(object_type)
+        found = field.nearest(position) if field is not None else None
+        slot, distance = found if found is not None else index.nearest(position)
+        return index.positions[slot], distance
+    
+    def collision_slot(self, position, object_type):
+        """Get the slot of an object of specified type the animat collides with, or None"""
+        index = self.indexes.get(object_type)
+        if index is None or not index.positions:
+            return None
         
-        distances = [np.sqrt((x - position[0])**2 + (y - position[1])**2) for x, y in objects]
-        min_idx = np.argmin(distances)
-        return objects[min_idx], distances[min_idx]
+        return index.first_within(position, SOURCE_SIZE + ANIMAT_SIZE)
     
     def check_collision(self, position, object_type):
         """Check if animat collides with any object of specified type"""
-        if object_type == 'food':
-            objects = self.food_sources
-        elif object_type == 'water':
-            objects = self.water_sources
-        elif object_type == 'trap':
-            objects = self.traps
-        else:
+        slot = self.collision_slot(position, object_type)
+        if slot is None:
             return False, None
+        return True, self.indexes[object_type].positions[slot]
+    
+    def _table(self, object_type):
+        """Get the CellTable of an object type, rebuilding the tables if any object changed since the last one"""
+        if self.tables_version != self.version:
+            self.tables = {}
+            self.tables_version = self.version
+        table = self.tables.get(object_type)
+        if table is None:
+            table = CellTable(self._get_objects(object_type), self.indexes[object_type].cell_size)
+            self.tables[object_type] = table
+        return table
+    
+    def nearest_objects(self, positions, object_type):
+        """Get the nearest object of a type for many positions at once.
+        
+        Returns the slot of each nearest object, its distance and its offset
+        (dx, dy) from the query position, each as an array with one entry per
+        position. Slots are -1 and distances inf when there are no objects.
+        Positions are looked up in the cells around them in one vectorized
+        pass, widened for the few whose nearest object may lie further away;
+        what is left falls back to the spatial index, so the slots match
+        get_nearest_object.
+        """
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        objects = self._get_objects(object_type)
+        if not len(objects):
+            count = len(positions)
+            return np.full(count, -1, dtype=np.int64), np.full(count, np.inf), np.zeros(count), np.zeros(count)
+        
+        with profiler.phase('environment.nearest_batch'):
+            table = self._table(object_type)
+            slots, _, exact = table.nearest(positions)
+            pending = np.flatnonzero(~exact)
+            for reach in (2, 4, 8):
+                if not len(pending):
+                    break
+                found, _, exact = table.nearest(positions[pending], reach)
+                slots[pending[exact]] = found[exact]
+                pending = pending[~exact]
+            index = self.indexes[object_type]
+            for row in pending.tolist():
+                slots[row] = index.nearest(tuple(positions[row].tolist()))[0]
+            dx = objects[slots, 0] - positions[:, 0]
+            dy = objects[slots, 1] - positions[:, 1]
+        return slots, np.sqrt(dx**2 + dy**2), dx, dy
+    
+    def collision_slots(self, positions, object_type):
+        """Get the slot of the nearest colliding object of a type for many positions, -1 where none collides"""
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        if not len(self._get_objects(object_type)):
+            return np.full(len(positions), -1, dtype=np.int64)
         
-        for obj_pos in objects:
-            distance = np.sqrt((obj_pos[0] - position[0])**2 + (obj_pos[1] - position[1])**2)
-            if distance < SOURCE_SIZE + ANIMAT_SIZE:
-                return True, obj_pos
-        return False, None
+        with profiler.phase('environment.collision_batch'):
+            # Index cells are never smaller than a collision, so the cells around a position hold every colliding object
+            slots, dist_sq, _ = self._table(object_type).nearest(positions)
+            slots[dist_sq >= (SOURCE_SIZE + ANIMAT_SIZE)**2] = -1
+        return slots
     
     def check_animat_collision(self, position1, position2):
         """Check if two animats collide"""
@@ -1,102 +1,579 @@
+import bisect
 import numpy as np
 import random
+from collections import OrderedDict
 from config import *
+from profiling import profiler
+from surrogate import RidgeSurrogate, rank_correlation
+from layouts import LayoutPool
+
+class FitnessCache:
+    """Fitness store keyed by genome, with per-generation or bounded LRU lifetime"""
+    def __init__(self, mode=None, max_size=None):
+        self.mode = mode or FITNESS_CACHE_MODE
+        if self.mode not in ('generation', 'lru'):
+            raise ValueError(f"Unknown fitness cache mode: {self.mode}")
+        self.max_size = max_size or FITNESS_CACHE_SIZE
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def key(genome):
+        """Hashable key for a genome of 0-99 genes"""
+        return bytes(genome)
+    
+    def get(self, genome):
+        """Return the cached fitness of a genome, or None if it is not stored"""
+        key = self.key(genome)
+        fitness = self.entries.get(key)
+        if fitness is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if self.mode == 'lru':
+            self.entries.move_to_end(key)
+        return fitness
+    
+    def put(self, genome, fitness):
+        """Store the fitness of a genome, evicting the least recently used entry if full"""
+        key = self.key(genome)
+        self.entries[key] = fitness
+        if self.mode == 'lru':
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+    
+    def new_generation(self):
+        """Drop entries that only live for one generation"""
+        if self.mode == 'generation':
+            self.entries.clear()
+    
+    def invalidate(self):
+        """Drop all entries but keep the counters, e.g. when fitness is measured on new layouts"""
+        self.entries.clear()
+    
+    def clear(self):
+        """Drop all entries and reset the counters"""
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+    
+    def __len__(self):
+        return len(self.entries)
+    
+    def get_statistics(self):
+        """Get the hit/miss counters of the cache"""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'size': len(self.entries)
+        }
+
+class FitnessRun:
+    """Resumable simulation of a single animat, as run by simulate_genome.
+    
+    If a SimulationLog is given, every step and respawn of the run is recorded
+    into it. If a Layout is given, the world and the animat's starting pose
+    come from it instead of the random module.
+    """
+    def __init__(self, genome, log=None, layout=None):
+        from animat import Animat
+        from environment import Environment
+        
+        self.env = Environment(layout=layout)
+        if layout is None:
+            self.animat = Animat(genome=genome)
+        else:
+            x, y, angle = layout.start.tolist()
+            self.animat = Animat(genome=genome, position=(x, y))
+            self.animat.angle = angle
+        self.total_fitness = 0
+        self.steps = 0
+        self.log = log
+        if log is not None:
+            log.start(self.env, self.animat)
+    
+    @property
+    def alive(self):
+        return self.animat.alive
+    
+    @property
+    def fitness(self):
+        """Average battery fitness over the steps simulated so far"""
+        return self.total_fitness / self.steps if self.steps > 0 else 0
+    
+    def advance(self, max_steps):
+        """Step until the animat dies or has lived max_steps steps, then return the fitness so far"""
+        animat = self.animat
+        update = animat.profiled_update if profiler.enabled else animat.update
+        while animat.alive and self.steps < max_steps:
+            update(self.env)
+            self.total_fitness += animat.get_fitness()
+            self.steps += 1
+            if self.log is not None:
+                self.log.record_step(animat)
+        return self.fitness
+
+def simulate_genome(genome, max_steps=None, layouts=None):
+    """Simulate a single animat with the given genome and return its average battery fitness.
+    
+    With a LayoutPool, the genome runs one episode per layout, one after the
+    other, and gets the mean fitness of the episodes.
+    """
+    if layouts is None:
+        return FitnessRun(genome).advance(max_steps or ANIMAT_MAX_LIFESPAN)
+    return sum(FitnessRun(genome, layout=layout).advance(max_steps or ANIMAT_MAX_LIFESPAN)
+               for layout in layouts) / len(layouts)
+
+def record_seeded_run(genome, seed, max_steps=None, layout=None):
+    """Record the run a process pool worker simulated for a genome and seed, leaving the random module untouched.
+    
+    With layouts, workers run the first layout's episode right after seeding,
+    so that is the episode recorded here.
+    """
+    from replay import SimulationLog
+    
+    state = random.getstate()
+    random.seed(seed)
+    try:
+        run = FitnessRun(np.asarray(genome).tolist(), SimulationLog(), layout)
+        run.advance(max_steps or ANIMAT_MAX_LIFESPAN)
+    finally:
+        random.setstate(state)
+    return run.log
 
 class GeneticAlgorithm:
-    def __init__(self):
-        self.population = []
+    def __init__(self, cache_mode=None, cache_size=None, backend=None, workers=None, chunksize=None,
+                 population_size=None, seed=None, halving_rungs=None, record_runs=None, surrogate=None,
+                 mode=None, batch_size=None, layout_count=None):
+        self.population_size = population_size or POPULATION_SIZE
+        self.mode = mode or GA_MODE
+        if self.mode not in ('generational', 'steady_state'):
+            raise ValueError(f"Unknown GA mode: {self.mode}")
+        self.batch_size = max(1, min(batch_size or STEADY_STATE_BATCH, self.population_size - 1))
+        # Seeded from the random module by default, so random.seed() makes whole runs reproducible
+        self.rng = np.random.default_rng(seed if seed is not None else random.getrandbits(64))
+        self.backend = backend or EVALUATION_BACKEND
+        if self.backend not in ('serial', 'vectorized', 'process'):
+            raise ValueError(f"Unknown evaluation backend: {self.backend}")
+        self.workers = workers
+        self.chunksize = chunksize
+        self.executor = None
+        # Horizons of successive-halving evaluation; empty evaluates every genome for the full lifespan
+        self.halving_rungs = [h for h in (HALVING_RUNGS if halving_rungs is None else halving_rungs)
+                              if h < ANIMAT_MAX_LIFESPAN]
+        # Number of seeded layouts every genome of a generation is evaluated on; 0 gives each run a fresh random world
+        self.layout_count = LAYOUT_COUNT if layout_count is None else layout_count
+        self.layouts = None
+        self.population = np.empty((0, GENOME_LENGTH), dtype=np.uint8)
+        # Steady-state mode: fitness of every population row and (fitness, row) pairs in ascending order
+        self.fitnesses = None
+        self.ranking = []
         self.generation = 0
         self.best_fitness_history = []
         self.avg_fitness_history = []
         self.min_fitness_history = []
+        # Successive halving: how many of each generation's fitnesses are short-horizon estimates
+        self.estimated_history = []
+        self.estimated = set()  # Fitness cache keys of this generation's estimated genomes
+        self.estimated_rows = None  # Steady-state mode: whether each population row's fitness is an estimate
+        # Fitnesses and best genome of the last evaluated generation, kept for telemetry and the final plot
+        self.last_fitnesses = None
+        self.best_genome = None
+        self.fitness_cache = FitnessCache(cache_mode, cache_size)
+        self.archive = None  # Optional GenerationArchive receiving every evaluated generation
+        # Keep a SimulationLog of each generation's best run for replay instead of re-simulating it
+        self.record_runs = RECORD_RUNS if record_runs is None else record_runs
+        self.run_logs = {}
+        self.best_log = None
+        # Optional surrogate model screening oversampled offspring before they are simulated
+        self.surrogate = None
+        if SURROGATE_ENABLED if surrogate is None else surrogate:
+            self.surrogate = RidgeSurrogate()
+        self.predictions = None  # Surrogate prediction per genome to evaluate next, nan where none was made
+        self.surrogate_accuracy = float('nan')
+        # Candidates the surrogate ranked below the evaluated generation's offspring; every child is still simulated
+        self.candidates_screened = 0
+        self.screened_out = 0
     
     def initialize_population(self):
-        """Initialize a new population of animats"""
-        self.population = []
-        for _ in range(POPULATION_SIZE):
-            genome = [random.randint(0, 99) for _ in range(GENOME_LENGTH)]
-            self.population.append(genome)
-    
-    def select_parent(self):
-        """Select a parent using tournament selection"""
-        tournament_size = 7
-        tournament = random.sample(self.population, tournament_size)
-        return max(tournament, key=lambda x: self.evaluate_fitness(x))
-    
-    def crossover(self, parent1, parent2):
-        """Perform crossover between two parents"""
-        if random.random() < CROSSOVER_RATE:
-            point = random.randint(0, GENOME_LENGTH - 1)
-            child1 = parent1[:point] + parent2[point:]
-            child2 = parent2[:point] + parent1[point:]
-            return child1, child2
-        return parent1, parent2
-    
-    def mutate(self, genome):
-        """Apply mutation to a genome"""
-        mutated = list(genome)
-        for i in range(len(mutated)):
-            if random.random() < MUTATION_RATE:
-                mutated[i] = random.randint(0, 99)
+        """Initialize a new population of animats as a (population_size, GENOME_LENGTH) uint8 matrix"""
+        self.population = self.rng.integers(0, 100, (self.population_size, GENOME_LENGTH), dtype=np.uint8)
+    
+    def select_parents(self, fitnesses, count):
+        """Select the indices of count parents by tournament selection over a fitness array"""
+        contenders = self.rng.integers(0, len(fitnesses), (count, TOURNAMENT_SIZE))
+        winners = np.argmax(fitnesses[contenders], axis=1)
+        return contenders[np.arange(count), winners]
+    
+    def crossover(self, parents1, parents2):
+        """Perform one-point crossover between matching rows of two parent arrays"""
+        shape = parents1.shape[:-1]
+        points = self.rng.integers(0, GENOME_LENGTH, shape)
+        # Pairs that skip crossover take the whole genome from their own parent
+        points = np.where(self.rng.random(shape) < CROSSOVER_RATE, points, GENOME_LENGTH)
+        from_first = np.arange(GENOME_LENGTH) < points[..., None]
+        child1 = np.where(from_first, parents1, parents2)
+        child2 = np.where(from_first, parents2, parents1)
+        return child1, child2
+    
+    def mutate(self, genomes):
+        """Apply mutation to an array of genomes"""
+        mutated = np.array(genomes, dtype=np.uint8)
+        mask = self.rng.random(mutated.shape) < MUTATION_RATE
+        mutated[mask] = self.rng.integers(0, 100, np.count_nonzero(mask), dtype=np.uint8)
         return mutated
     
+    def draw_layouts(self):
+        """Draw a new LayoutPool for the evaluations to share, or None without layouts.
+        
+        Cached fitnesses were measured on the old pool, so they are dropped.
+        """
+        if not self.layout_count:
+            return None
+        self.fitness_cache.invalidate()
+        return LayoutPool(self.rng.integers(0, 2**63, self.layout_count))
+    
+    @property
+    def episodes(self):
+        """Number of simulated episodes per genome"""
+        return len(self.layouts) if self.layouts is not None else 1
+    
     def evaluate_fitness(self, genome):
         """Evaluate the fitness of a genome by running a simulation"""
-        from animat import Animat
-        from environment import Environment
+        return simulate_genome(genome, layouts=self.layouts)
+    
+    def evaluate_population(self, genomes):
+        """Get the fitness of many genomes, simulating the uncached ones in one batch.
         
-        env = Environment()
-        animat = Animat(genome=genome)
-        total_fitness = 0
-        steps = 0
+        Copies of a genome share one simulation and count as cache hits.
+        """
+        fitnesses = [None] * len(genomes)
+        pending = {}
+        for i, genome in enumerate(genomes):
+            key = self.fitness_cache.key(genome)
+            if key in pending:
+                pending[key].append(i)
+                self.fitness_cache.hits += 1
+                continue
+            fitnesses[i] = self.fitness_cache.get(genome)
+            if fitnesses[i] is None:
+                pending[key] = [i]
         
-        while animat.alive and steps < ANIMAT_MAX_LIFESPAN:
-            animat.update(env)
-            total_fitness += animat.get_fitness()
-            steps += 1
+        if pending:
+            indices = [idx[0] for idx in pending.values()]
+            results = self.evaluate_batch([genomes[i] for i in indices])
+            for (key, idx), fitness in zip(pending.items(), results):
+                # An estimate is not cached, so the genome gets a full evaluation if it comes back
+                if key not in self.estimated:
+                    self.fitness_cache.put(genomes[idx[0]], fitness)
+                for i in idx:
+                    fitnesses[i] = fitness
+        return fitnesses
+    
+    def evaluate_batch(self, genomes):
+        """Simulate a list of genomes with the configured backend"""
+        if self.halving_rungs:
+            return self.evaluate_halving(genomes)
+        if self.backend == 'vectorized':
+            simulator = self.start_runs(genomes)
+            self.keep_run_logs(genomes, simulator)
+            return self.advance_runs(simulator, genomes, np.arange(len(genomes)), ANIMAT_MAX_LIFESPAN)[0].tolist()
+        if self.backend == 'process':
+            # Seeds are drawn in task order so results do not depend on the worker count
+            seeds = self.rng.integers(0, 2**32, len(genomes))
+            self.keep_run_logs(genomes, seeds)
+            return self.get_executor().evaluate(genomes, seeds.tolist(), self.layout_seeds())
+        if self.record_runs:
+            from replay import SimulationLog
+            runs = []
+            for genome in genomes:
+                for layout in self.layouts or [None]:
+                    runs.append(FitnessRun(genome, SimulationLog(), layout))
+                    runs[-1].advance(ANIMAT_MAX_LIFESPAN)
+            self.keep_run_logs(genomes, runs)
+            return np.array([run.fitness for run in runs]).reshape(len(genomes), -1).mean(axis=1).tolist()
+        return [self.evaluate_fitness(genome) for genome in genomes]
+    
+    def keep_run_logs(self, genomes, runs):
+        """Remember where the recorded run of each genome is, if runs are recorded"""
+        if self.record_runs:
+            for i, genome in enumerate(genomes):
+                self.run_logs[self.fitness_cache.key(genome)] = (runs, i)
+    
+    def get_run_log(self, genome):
+        """Get the SimulationLog of the run that gave a genome its fitness this generation, or None"""
+        entry = self.run_logs.get(self.fitness_cache.key(genome))
+        if entry is None:
+            return None
+        # With layouts, the log is the genome's episode on the first one
+        runs, i = entry
+        if self.backend == 'vectorized':
+            return runs.get_log(i * self.episodes)
+        if self.backend == 'process':
+            # Workers do not send logs back; the seeded run is repeated here instead
+            return record_seeded_run(genome, int(runs[i]), layout=self.layouts[0] if self.layouts is not None else None)
+        return runs[i * self.episodes].log
+    
+    def get_executor(self):
+        """Get the process pool of the 'process' backend, starting it on first use"""
+        if self.executor is None:
+            from parallel import ParallelEvaluator
+            self.executor = ParallelEvaluator(self.workers, self.chunksize)
+        return self.executor
+    
+    def evaluate_halving(self, genomes):
+        """Simulate genomes by successive halving over self.halving_rungs.
         
-        return total_fitness / steps if steps > 0 else 0
+        Every genome is simulated up to the first rung's horizon. At each rung
+        the best HALVING_PROMOTE share of the animats still alive, but at
+        least ELITE_COUNT of them, continue to the next rung, and the last
+        rung runs to ANIMAT_MAX_LIFESPAN. Animats that died before a rung
+        already have their final fitness. The others keep their rung fitness
+        as an estimate, scaled down together so the best of them is at most
+        the lowest promoted fitness. They keep ranking below every genome
+        they lost to and in their rung order among themselves, and are added
+        to self.estimated.
+        """
+        genomes = np.asarray(genomes, dtype=np.uint8)
+        runs = self.start_runs(genomes)
+        self.keep_run_logs(genomes, runs)
+        fitnesses = np.zeros(len(genomes))
+        active = np.arange(len(genomes))
+        dropped = []
+        
+        for horizon in self.halving_rungs + [ANIMAT_MAX_LIFESPAN]:
+            scores, alive = self.advance_runs(runs, genomes, active, horizon)
+            fitnesses[active] = scores
+            if horizon == ANIMAT_MAX_LIFESPAN:
+                break
+            running = active[alive]
+            order = running[np.argsort(-fitnesses[running], kind='stable')]
+            keep = max(ELITE_COUNT, int(np.ceil(len(running) * HALVING_PROMOTE)))
+            promoted = np.sort(order[:keep])
+            dropped.append((order[keep:], promoted))
+            active = promoted
+        
+        # Scale the last rung first, so its estimates feed the ceilings of the rungs before it.
+        # The rung fitness is not extrapolated: how it relates to the final fitness varies too much between genomes
+        for rest, promoted in reversed(dropped):
+            if len(rest):
+                ceiling = fitnesses[promoted].min()
+                highest = fitnesses[rest].max()
+                if highest > ceiling:
+                    fitnesses[rest] *= ceiling / highest
+                self.estimated.update(self.fitness_cache.key(genomes[i]) for i in rest)
+        return fitnesses.tolist()
+    
+    def layout_seeds(self):
+        """Get the seeds of this generation's layouts, from which process pool workers rebuild them"""
+        return self.layouts.seeds if self.layouts is not None else None
+    
+    def start_runs(self, genomes):
+        """Start resumable simulations of genomes with the configured backend, one per genome and layout"""
+        if self.backend == 'vectorized':
+            from simulation import PopulationSimulator
+            if self.layouts is None:
+                return PopulationSimulator(genomes, record=self.record_runs)
+            # Episode row r runs genome r // episodes on layout r % episodes
+            return PopulationSimulator(np.repeat(np.asarray(genomes), self.episodes, axis=0), record=self.record_runs,
+                                       layouts=self.layouts, layout_ids=np.tile(np.arange(self.episodes), len(genomes)))
+        if self.backend == 'process':
+            # Workers cannot keep runs between rungs, so each rung replays a run from its seed
+            return self.rng.integers(0, 2**32, len(genomes))
+        if self.record_runs:
+            from replay import SimulationLog
+            return [FitnessRun(genome, SimulationLog(), layout) for genome in genomes for layout in self.layouts or [None]]
+        return [FitnessRun(genome, layout=layout) for genome in genomes for layout in self.layouts or [None]]
+    
+    def advance_runs(self, runs, genomes, rows, horizon):
+        """Advance the runs of the given rows to horizon steps, returning their fitnesses and which are still alive.
+        
+        A genome's fitness is the mean over its episodes, and it is alive while any of its episodes is.
+        """
+        if self.backend == 'process':
+            results = self.get_executor().run(genomes[rows], runs[rows].tolist(), horizon, self.layout_seeds())
+            fitnesses, alive = zip(*results) if results else ((), ())
+            return np.array(fitnesses), np.array(alive, dtype=bool)
+        episodes = self.episodes
+        episode_rows = (np.asarray(rows, dtype=np.int64)[:, None] * episodes + np.arange(episodes)).ravel()
+        if self.backend == 'vectorized':
+            runs.retire(np.setdiff1d(np.arange(runs.n), episode_rows))
+            fitnesses = runs.run(horizon)[episode_rows]
+            alive = runs.alive[episode_rows]
+        else:
+            fitnesses = np.array([runs[i].advance(horizon) for i in episode_rows])
+            alive = np.array([runs[i].alive for i in episode_rows], dtype=bool)
+        return (fitnesses.reshape(-1, episodes).mean(axis=1),
+                alive.reshape(-1, episodes).any(axis=1))
+    
+    def close(self):
+        """Shut down the worker processes of the 'process' backend"""
+        if self.executor is not None:
+            self.executor.close()
+            self.executor = None
     
     def evolve(self):
-        """Evolve the population for one generation"""
-        # Evaluate current population
-        fitnesses = [self.evaluate_fitness(genome) for genome in self.population]
+        """Evolve the population for one generation, or one steady-state iteration"""
+        if self.mode == 'steady_state':
+            self.evolve_steady_state()
+            return
+        # Evaluate current population, filling the fitness cache for selection
+        with profiler.phase('genetic.evaluate'):
+            self.fitness_cache.new_generation()
+            self.layouts = self.draw_layouts()
+            self.run_logs = {}
+            self.estimated = set()
+            fitnesses = self.evaluate_population(self.population)
+            if self.record_runs:
+                # A best genome whose fitness came from the cache has no new run to log
+                log = self.get_run_log(self.population[int(np.argmax(fitnesses))])
+                if log is not None:
+                    self.best_log = log
+        if self.archive is not None:
+            self.archive.append(self.generation, self.population, fitnesses)
+        if self.surrogate is not None:
+            with profiler.phase('genetic.surrogate'):
+                self.train_surrogate(self.population, fitnesses)
         
         # Record statistics
-        self.best_fitness_history.append(max(fitnesses))
-        self.avg_fitness_history.append(sum(fitnesses) / len(fitnesses))
-        self.min_fitness_history.append(min(fitnesses))
-        
-        # Create new population
-        new_population = []
-        
-        # Elitism: keep the best 5 individuals
-        elite_indices = np.argsort(fitnesses)[-5:]
-        for idx in elite_indices:
-            new_population.append(self.population[idx])
-        
-        # Create rest of new population
-        while len(new_population) < POPULATION_SIZE:
-            # Select parents
-            parent1 = self.select_parent()
-            parent2 = self.select_parent()
-            
-            # Crossover
-            child1, child2 = self.crossover(parent1, parent2)
-            
-            # Mutate
-            child1 = self.mutate(child1)
-            child2 = self.mutate(child2)
-            
-            new_population.extend([child1, child2])
-        
-        # Trim to population size if we have too many
-        self.population = new_population[:POPULATION_SIZE]
+        self.record_history(np.asarray(fitnesses, dtype=np.float64),
+                            np.array([self.fitness_cache.key(genome) in self.estimated
+                                      for genome in self.population], dtype=bool))
+        self.last_fitnesses = np.asarray(fitnesses, dtype=np.float64)
+        self.best_genome = self.population[int(np.argmax(fitnesses))].copy()
+        
+        with profiler.phase('genetic.breed'):
+            self.population = self.breed(fitnesses)
+        self.generation += 1
+    
+    def evolve_steady_state(self):
+        """Replace the worst members of the population with a batch of evaluated offspring"""
+        if self.fitnesses is None:
+            # The first iteration (or the first after a resume) evaluates the whole population
+            genomes = self.population
+            rows = np.arange(len(genomes))
+        else:
+            with profiler.phase('genetic.breed'):
+                genomes = self.make_children(self.fitnesses, self.batch_size)
+            rows = np.array([row for _, row in self.ranking[:len(genomes)]])
+        
+        with profiler.phase('genetic.evaluate'):
+            self.fitness_cache.new_generation()
+            if self.fitnesses is None:
+                # The whole run shares one pool, so offspring and the incumbents they replace are scored alike
+                self.layouts = self.draw_layouts()
+            self.run_logs = {}
+            self.estimated = set()
+            fitnesses = np.asarray(self.evaluate_population(genomes), dtype=np.float64)
+            estimated = np.array([self.fitness_cache.key(genome) in self.estimated for genome in genomes], dtype=bool)
+            if self.record_runs and (not self.ranking or fitnesses.max() > self.ranking[-1][0]):
+                # Only a new best individual brings a new best run
+                log = self.get_run_log(genomes[int(np.argmax(fitnesses))])
+                if log is not None:
+                    self.best_log = log
+        if self.archive is not None:
+            self.archive.append(self.generation, genomes, fitnesses)
+        if self.surrogate is not None:
+            with profiler.phase('genetic.surrogate'):
+                self.train_surrogate(genomes, fitnesses)
+        
+        # Replace the worst rows and keep the ranking sorted
+        if self.fitnesses is None:
+            self.population = genomes.copy()
+            self.fitnesses = fitnesses
+            self.estimated_rows = estimated
+            self.ranking = sorted(zip(fitnesses.tolist(), rows.tolist()))
+        else:
+            del self.ranking[:len(genomes)]
+            self.population[rows] = genomes
+            self.fitnesses[rows] = fitnesses
+            self.estimated_rows[rows] = estimated
+            for entry in zip(fitnesses.tolist(), rows.tolist()):
+                bisect.insort(self.ranking, entry)
+        
+        # Record statistics of the whole population
+        self.record_history(self.fitnesses, self.estimated_rows)
+        self.last_fitnesses = self.fitnesses.copy()
+        self.best_genome = self.population[self.ranking[-1][1]].copy()
         self.generation += 1
     
+    def record_history(self, fitnesses, estimated):
+        """Append a generation's best, average and minimum fitness and its number of estimates.
+        
+        Estimated fitnesses are left out of the average and minimum.
+        """
+        measured = fitnesses[~estimated] if not estimated.all() else fitnesses
+        self.best_fitness_history.append(float(fitnesses.max()))
+        self.avg_fitness_history.append(sum(measured.tolist()) / len(measured))
+        self.min_fitness_history.append(float(measured.min()))
+        self.estimated_history.append(int(estimated.sum()))
+    
+    def breed(self, fitnesses):
+        """Create the next population from the current one and its fitnesses"""
+        fitnesses = np.asarray(fitnesses)
+        
+        # Elitism: keep the best individuals
+        elite_indices = np.argsort(fitnesses)[-ELITE_COUNT:]
+        children = self.make_children(fitnesses, self.population_size - len(elite_indices))
+        if self.predictions is not None:
+            self.predictions = np.concatenate((np.full(len(elite_indices), np.nan), self.predictions))
+        return np.concatenate((self.population[elite_indices], children))
+    
+    def make_children(self, fitnesses, count):
+        """Breed count children from the population, screening them with the surrogate if there is one"""
+        # With a surrogate, breed SURROGATE_OVERSAMPLE times more children and screen them
+        num_candidates = count * SURROGATE_OVERSAMPLE if self.surrogate is not None else count
+        
+        # Select parent pairs, cross them over and mutate the children
+        num_pairs = -(-num_candidates // 2)
+        parents = self.population[self.select_parents(np.asarray(fitnesses), 2 * num_pairs)]
+        child1, child2 = self.crossover(parents[0::2], parents[1::2])
+        children = self.mutate(np.stack((child1, child2), axis=1).reshape(-1, GENOME_LENGTH))
+        if self.surrogate is not None:
+            with profiler.phase('genetic.surrogate'):
+                return self.screen_children(children[:num_candidates], count)
+        return children[:count]
+    
+    def train_surrogate(self, genomes, fitnesses):
+        """Score the surrogate's predictions for evaluated genomes, then train it on them"""
+        fitnesses = np.asarray(fitnesses, dtype=np.float64)
+        if self.predictions is not None:
+            predicted = ~np.isnan(self.predictions)
+            self.surrogate_accuracy = rank_correlation(self.predictions[predicted], fitnesses[predicted])
+            self.candidates_screened = self.screened_out
+        self.surrogate.update(genomes, fitnesses)
+    
+    def screen_children(self, candidates, count):
+        """Pick count of the candidate children: the best predicted ones plus a random SURROGATE_RANDOM_SHARE.
+        
+        Until the rank correlation of the model's last predictions with the
+        simulated fitnesses exceeds SURROGATE_MIN_ACCURACY, the children are
+        picked at random instead, and their predictions only score the model.
+        """
+        predicted = self.surrogate.predict(candidates)
+        if not self.surrogate_accuracy > SURROGATE_MIN_ACCURACY:
+            chosen = self.rng.choice(len(candidates), count, replace=False)
+            self.screened_out = 0
+            self.predictions = predicted[chosen]
+            return candidates[chosen]
+        num_random = int(round(count * SURROGATE_RANDOM_SHARE))
+        order = np.argsort(-predicted, kind='stable')
+        # The random share comes from the candidates the model would have rejected
+        chosen = np.concatenate((order[:count - num_random],
+                                 self.rng.choice(order[count - num_random:], num_random, replace=False)))
+        self.screened_out = len(candidates) - count
+        self.predictions = predicted[chosen]
+        return candidates[chosen]
+    
     def get_best_individual(self):
-        """Get the best individual from the current population"""
-        fitnesses = [self.evaluate_fitness(genome) for genome in self.population]
+        """Get the best individual of the last evaluated generation, evaluating the population if there is none"""
+        if self.best_genome is not None:
+            return self.best_genome
+        fitnesses = self.evaluate_population(self.population)
         best_idx = np.argmax(fitnesses)
         return self.population[best_idx]
     
@@ -106,5 +583,10 @@ class GeneticAlgorithm:
             'generation': self.generation,
             'best_fitness': self.best_fitness_history[-1],
             'avg_fitness': self.avg_fitness_history[-1],
-            'min_fitness': self.min_fitness_history[-1]
+            'min_fitness': self.min_fitness_history[-1],
+            'cache_hits': self.fitness_cache.hits,
+            'cache_misses': self.fitness_cache.misses,
+            **({'estimated_fitnesses': self.estimated_history[-1]} if self.halving_rungs else {}),
+            **({'surrogate_accuracy': self.surrogate_accuracy, 'candidates_screened': self.candidates_screened}
+               if self.surrogate is not None else {})
         } 
\ No newline at end of file
@@ -0,0 +1,172 @@
+import multiprocessing
+import random
+import numpy as np
+from config import *
+
+TOPOLOGIES = ('ring', 'random', 'fully_connected')
+
+class _LastGeneration:
+    """Archive stand-in that keeps only the most recently evaluated generation of an island"""
+    def __init__(self):
+        self.genomes = None
+        self.fitnesses = None
+
+    def append(self, generation, genomes, fitnesses):
+        self.genomes = np.array(genomes, dtype=np.uint8)
+        self.fitnesses = np.asarray(fitnesses, dtype=np.float64)
+
+def _island_main(conn, seed, population_size, migration_count, layout_count):
+    """Island process: evolve one sub-population on request, trading migrants with the parent"""
+    from genetic import GeneticAlgorithm
+
+    random.seed(seed)
+    ga = GeneticAlgorithm(backend='serial', population_size=population_size, seed=seed, mode='generational',
+                          layout_count=layout_count)
+    ga.initialize_population()
+    ga.archive = last = _LastGeneration()
+    try:
+        while True:
+            message = conn.recv()
+            if message is None:
+                break
+            immigrants = np.frombuffer(message, dtype=np.uint8).reshape(-1, GENOME_LENGTH)
+            if len(immigrants):
+                # Immigrants take the place of the last bred children, never of the elites
+                ga.population[-len(immigrants):] = immigrants
+
+            ga.evolve()
+            order = np.argsort(last.fitnesses)[::-1][:migration_count]
+            conn.send((
+                ga.get_statistics(),
+                ga.population.tobytes(),
+                last.genomes[order].tobytes(),
+                last.fitnesses[order].tobytes(),
+                last.fitnesses.tobytes()
+            ))
+    finally:
+        ga.close()
+        conn.close()
+
+class IslandModel:
+    """Island-model GA: K sub-populations evolving in their own processes.
+
+    Every island is a GeneticAlgorithm with the usual tournament selection,
+    crossover, mutation and elitism, evaluated serially in its own process.
+    Every migration_interval generations each island sends its best
+    migration_count genomes to the islands its topology connects it to, where
+    they replace the newest children. Genomes cross process boundaries as
+    uint8 byte buffers. The aggregated histories, population, generation and
+    get_statistics() mirror GeneticAlgorithm, so headless runs, the display
+    and plot_statistics work unchanged. With layout_count, every island draws
+    its own pool of seeded layouts per generation.
+    """
+    def __init__(self, num_islands=None, island_size=None, migration_interval=None, migration_count=None,
+                 topology=None, start_method=None, seed=None, layout_count=None):
+        self.num_islands = num_islands or ISLAND_COUNT
+        self.island_size = island_size or max(ELITE_COUNT + 2, POPULATION_SIZE // self.num_islands)
+        self.migration_interval = migration_interval or MIGRATION_INTERVAL
+        self.migration_count = max(1, min(migration_count or MIGRATION_COUNT, self.island_size - ELITE_COUNT))
+        self.topology = topology or MIGRATION_TOPOLOGY
+        if self.topology not in TOPOLOGIES:
+            raise ValueError(f"Unknown migration topology: {self.topology}")
+        self.rng = np.random.default_rng(seed if seed is not None else random.getrandbits(64))
+
+        self.generation = 0
+        self.best_fitness_history = []
+        self.avg_fitness_history = []
+        self.min_fitness_history = []
+        self.estimated_history = []  # Islands do not use successive halving, so this stays empty
+        self.population = np.empty((0, GENOME_LENGTH), dtype=np.uint8)
+        self.best_genome = None
+        self.last_fitnesses = None
+        self.best_log = None  # Runs are not recorded inside island processes
+        self.statistics = {}
+        self.emigrants = [np.empty((0, GENOME_LENGTH), dtype=np.uint8)] * self.num_islands
+        self.emigrant_fitnesses = [np.empty(0)] * self.num_islands
+
+        context = multiprocessing.get_context(start_method or PARALLEL_START_METHOD)
+        self.connections = []
+        self.processes = []
+        for island_seed in self.rng.integers(0, 2**63, self.num_islands).tolist():
+            conn, child_conn = context.Pipe()
+            process = context.Process(target=_island_main, daemon=True,
+                                      args=(child_conn, island_seed, self.island_size, self.migration_count,
+                                            layout_count))
+            process.start()
+            child_conn.close()
+            self.connections.append(conn)
+            self.processes.append(process)
+
+    def _incoming(self):
+        """Pick the immigrants of every island from the last emigrants according to the topology"""
+        k = self.num_islands
+        if k < 2:
+            return [self.emigrants[0][:0]]
+        if self.topology == 'ring':
+            return [self.emigrants[(i - 1) % k] for i in range(k)]
+        if self.topology == 'random':
+            sources = [(i + int(self.rng.integers(1, k))) % k for i in range(k)]
+            return [self.emigrants[source] for source in sources]
+        # Fully connected: the best migrants among those of every other island
+        incoming = []
+        for i in range(k):
+            genomes = np.concatenate([self.emigrants[j] for j in range(k) if j != i])
+            fitnesses = np.concatenate([self.emigrant_fitnesses[j] for j in range(k) if j != i])
+            incoming.append(genomes[np.argsort(fitnesses)[::-1][:self.migration_count]])
+        return incoming
+
+    def evolve(self):
+        """Evolve every island for one generation, exchanging migrants when the interval is reached"""
+        migrate = self.generation > 0 and self.generation % self.migration_interval == 0
+        incoming = self._incoming() if migrate else [self.emigrants[0][:0]] * self.num_islands
+        for conn, immigrants in zip(self.connections, incoming):
+            conn.send(np.ascontiguousarray(immigrants, dtype=np.uint8).tobytes())
+
+        results = [conn.recv() for conn in self.connections]
+        stats = [result[0] for result in results]
+        populations = [np.frombuffer(result[1], dtype=np.uint8).reshape(-1, GENOME_LENGTH) for result in results]
+        self.emigrants = [np.frombuffer(result[2], dtype=np.uint8).reshape(-1, GENOME_LENGTH) for result in results]
+        self.emigrant_fitnesses = [np.frombuffer(result[3], dtype=np.float64) for result in results]
+        self.population = np.concatenate(populations)
+        self.last_fitnesses = np.concatenate([np.frombuffer(result[4], dtype=np.float64) for result in results])
+
+        # Aggregate the islands as one population of equally sized sub-populations
+        self.best_fitness_history.append(max(s['best_fitness'] for s in stats))
+        self.avg_fitness_history.append(sum(s['avg_fitness'] for s in stats) / len(stats))
+        self.min_fitness_history.append(min(s['min_fitness'] for s in stats))
+        best_island = int(np.argmax([fitnesses[0] for fitnesses in self.emigrant_fitnesses]))
+        self.best_genome = self.emigrants[best_island][0].copy()
+        self.statistics = {
+            'cache_hits': sum(s['cache_hits'] for s in stats),
+            'cache_misses': sum(s['cache_misses'] for s in stats)
+        }
+        self.generation += 1
+
+    def get_best_individual(self):
+        """Get the genome with the best fitness in the last evaluated generation of any island"""
+        return self.best_genome
+
+    def get_statistics(self):
+        """Get the current statistics aggregated over all islands"""
+        return {
+            'generation': self.generation,
+            'best_fitness': self.best_fitness_history[-1],
+            'avg_fitness': self.avg_fitness_history[-1],
+            'min_fitness': self.min_fitness_history[-1],
+            'cache_hits': self.statistics['cache_hits'],
+            'cache_misses': self.statistics['cache_misses']
+        }
+
+    def close(self):
+        """Stop the island processes"""
+        for conn in self.connections:
+            try:
+                conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self.processes:
+            process.join()
+        for conn in self.connections:
+            conn.close()
+        self.connections = []
+        self.processes = []
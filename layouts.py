@@ -0,0 +1,65 @@
+import numpy as np
+from config import *
+
+OBJECT_COUNTS = {'food': BASE_FOOD_COUNT, 'water': BASE_WATER_COUNT, 'trap': BASE_TRAP_COUNT}
+RESPAWN_TYPES = ('food', 'water')
+# A stuck animat turns at most once every STUCK_THRESHOLD + 1 steps
+TURN_COUNT = ANIMAT_MAX_LIFESPAN // (STUCK_THRESHOLD + 1) + 1
+
+class Layout:
+    """Read-only view of one world of a LayoutPool, as loaded by Environment.load_layout"""
+    def __init__(self, pool, k):
+        self.seed = pool.seeds[k]
+        self.size = pool.size
+        self.objects = {obj_type: objects[k] for obj_type, objects in pool.objects.items()}
+        self.start = pool.starts[k]
+        self.respawns = {obj_type: positions[k] for obj_type, positions in pool.respawns.items()}
+        self.turns = pool.turns[k]
+        self.indexes = None  # Spatial indexes of the starting objects, built by the first Environment
+        self.fields = None  # Nearest-object fields of the starting objects, built along with the indexes
+
+class LayoutPool:
+    """K seeded single-animat worlds shared by every fitness evaluation of a generation.
+
+    A layout fixes the starting object positions, the animat's starting
+    position and angle, the sequence of positions consumed food and water
+    respawn at and the sequence of angles a stuck animat turns to, so every
+    genome meets the same K episodes. Each layout is drawn from its own seed
+    and the arrays are stacked over layouts (objects[type] is
+    (K, count, 2), starts (K, 3), respawns[type] (K, ANIMAT_MAX_LIFESPAN, 2),
+    turns (K, TURN_COUNT)) and marked read-only.
+    """
+    def __init__(self, seeds):
+        self.seeds = [int(seed) for seed in seeds]
+        self.size = BASE_ENV_SIZE
+        low, high = OBJECT_PLACEMENT_PADDING, self.size - OBJECT_PLACEMENT_PADDING
+        objects = {obj_type: [] for obj_type in OBJECT_COUNTS}
+        starts = []
+        respawns = {obj_type: [] for obj_type in RESPAWN_TYPES}
+        turns = []
+        for seed in self.seeds:
+            rng = np.random.default_rng(seed)
+            for obj_type, count in OBJECT_COUNTS.items():
+                objects[obj_type].append(rng.uniform(low, high, (count, 2)))
+            starts.append((rng.uniform(0, BASE_ENV_SIZE), rng.uniform(0, BASE_ENV_SIZE), rng.uniform(0, 2 * np.pi)))
+            # An animat eats at most one object of each type per step
+            for obj_type in RESPAWN_TYPES:
+                respawns[obj_type].append(rng.uniform(low, high, (ANIMAT_MAX_LIFESPAN, 2)))
+            turns.append(rng.uniform(0, 2 * np.pi, TURN_COUNT))
+
+        self.objects = {obj_type: np.stack(arrays) for obj_type, arrays in objects.items()}
+        self.starts = np.array(starts, dtype=np.float64)
+        self.respawns = {obj_type: np.stack(arrays) for obj_type, arrays in respawns.items()}
+        self.turns = np.stack(turns)
+        for array in (self.starts, self.turns, *self.objects.values(), *self.respawns.values()):
+            array.flags.writeable = False
+        self.layouts = [Layout(self, k) for k in range(len(self.seeds))]
+
+    def __len__(self):
+        return len(self.layouts)
+
+    def __getitem__(self, k):
+        return self.layouts[k]
+
+    def __iter__(self):
+        return iter(self.layouts)
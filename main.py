@@ -1,92 +1,318 @@
-import pygame
+import argparse
+import os
+import queue
+import random
 import sys
+import time
+import numpy as np
 from environment import Environment
-from animat import Animat
+from animat import Animat, AnimatBatch, TrajectoryRecorder
+from controller import CompiledController
 from genetic import GeneticAlgorithm
-from visualization import Visualizer
+from islands import IslandModel, TOPOLOGIES
+from checkpoint import GenerationArchive, checkpoint_state, load_checkpoint, save_checkpoint
+from pipeline import EvolutionWorker
+from spatial import NeighborIndex
 from config import *
+from profiling import profiler
+from telemetry import StatsSink, TELEMETRY_FORMATS
 
 def get_num_animats():
     """Get the number of animats from user input"""
     while True:
         try:
-            num = int(input("Enter number of animats (1-10): "))
-            if 1 <= num <= 10:
+            num = int(input(f"Enter number of animats (1-{MAX_ANIMATS}): "))
+            if 1 <= num <= MAX_ANIMATS:
                 return num
-            print("Please enter a number between 1 and 10")
+            print(f"Please enter a number between 1 and {MAX_ANIMATS}")
         except ValueError:
             print("Please enter a valid number")
 
-def main():
+def simulation_step(env, animats, neighbors=None, batch=None):
+    """Advance every living animat by one step and apply animat collision damage.
+
+    neighbors is the NeighborIndex of the animats at the start of the step.
+    The index built from their new positions is used for collision damage
+    and returned, so the next step can sense with it. Worlds of at least
+    BATCH_MIN_ANIMATS animats are stepped by batch, their AnimatBatch kept
+    across the steps of a generation; smaller ones one animat at a time.
+    """
+    if neighbors is None:
+        neighbors = NeighborIndex(animats)
+    if batch is None and len(animats) >= BATCH_MIN_ANIMATS:
+        batch = AnimatBatch(animats)
+    
+    # Update animats
+    with profiler.phase('main.animat_update'):
+        if batch is not None:
+            batch.update(env, neighbors)
+        else:
+            update = Animat.profiled_update if profiler.enabled else Animat.update
+            for animat in animats:
+                if animat.alive:
+                    update(animat, env, neighbors=neighbors)
+    
+    with profiler.phase('main.neighbor_index'):
+        neighbors = NeighborIndex(animats)
+    
+    # Check for animat collisions
+    with profiler.phase('main.animat_collision'):
+        # Each collision costs both animats COLLISION_DAMAGE, so sum them per animat first
+        hits = np.bincount(neighbors.colliding_pairs(ANIMAT_SIZE * 2).ravel(), minlength=len(animats))
+        for i, count in zip(np.flatnonzero(hits).tolist(), hits[hits > 0].tolist()):
+            animats[i].battery1 = max(0, animats[i].battery1 - count * COLLISION_DAMAGE)
+            animats[i].battery2 = max(0, animats[i].battery2 - count * COLLISION_DAMAGE)
+    return neighbors
+
+def create_animats(env, population, trajectories=False):
+    """Fill the world with env.num_animats animats spread over the whole world.
+    
+    A population smaller than the world is cycled through, so every genome
+    gets the same number of animats, give or take one, all sharing its
+    controller. With trajectories, every animat records its path for display.
+    """
+    controllers = [CompiledController(genome) for genome in population[:env.num_animats]]
+    animats = []
+    for i in range(env.num_animats):
+        position = (random.uniform(0, env.size), random.uniform(0, env.size))
+        trajectory = TrajectoryRecorder(TRAJECTORY_INTERVAL, TRAJECTORY_CAPACITY) if trajectories else None
+        j = i % len(population)
+        animats.append(Animat(genome=population[j], position=position, trajectory=trajectory, controller=controllers[j]))
+    return animats
+
+def run_generation(env, animats, draw=None):
+    """Simulate the animats of one generation, calling draw after every SIMULATION_SPEED steps.
+    
+    Stops early if draw returns False.
+    """
+    step = 0
+    neighbors = None
+    batch = AnimatBatch(animats) if len(animats) >= BATCH_MIN_ANIMATS else None
+    while step < ANIMAT_MAX_LIFESPAN and any(animat.alive for animat in animats):
+        # Update animats multiple times per frame for faster simulation
+        for _ in range(SIMULATION_SPEED):
+            neighbors = simulation_step(env, animats, neighbors, batch)
+            step += 1
+            if step >= ANIMAT_MAX_LIFESPAN or not any(animat.alive for animat in animats):
+                break
+        
+        # Draw environment only every FRAME_SKIP frames
+        # if step % FRAME_SKIP == 0:
+        if draw is not None and draw() is False:
+            break
+    return step
+
+def create_ga(args, env):
+    """Create the genetic algorithm, resuming from a checkpoint and attaching an archive if requested"""
+    if args.islands:
+        return IslandModel(args.islands, topology=args.topology, layout_count=args.layouts)
+    ga = GeneticAlgorithm(halving_rungs=args.halving_rungs, record_runs=args.record or None,
+                           surrogate=args.surrogate or None,
+                           mode='steady_state' if args.steady_state else None, batch_size=args.steady_state,
+                           layout_count=args.layouts)
+    if args.resume:
+        load_checkpoint(args.resume, ga, env)
+        print(f"Resumed from {args.resume} at generation {ga.generation}")
+    else:
+        ga.initialize_population()
+    
+    if args.archive:
+        ga.archive = GenerationArchive(os.path.join(args.output, 'archive'))
+        # Generations after the checkpoint are evolved again, so drop their old records
+        ga.archive.truncate(ga.generation)
+    return ga
+
+def save_progress(ga, env, output_dir, checkpoint_every, force=False, state=None):
+    """Write a checkpoint every checkpoint_every generations, or now if forced, even with checkpoint_every 0.
+    
+    A state from checkpoint_state() is written instead of ga's current one if given.
+    """
+    generation = int(state['generation']) if state is not None else ga.generation
+    if force or (checkpoint_every and generation % checkpoint_every == 0):
+        os.makedirs(output_dir, exist_ok=True)
+        save_checkpoint(os.path.join(output_dir, 'checkpoint.npz'), ga, env, state)
+
+def run_headless(ga, env, max_generations, output_dir, checkpoint_every=0, telemetry_format=None):
+    """Run the evolution without any window or frame rate cap, streaming statistics to output_dir"""
+    telemetry_format = telemetry_format or TELEMETRY_FORMAT
+    os.makedirs(output_dir, exist_ok=True)
+    
+    # A resumed run keeps the statistics of the generations up to its checkpoint
+    stats_path = os.path.join(output_dir, f'statistics.{telemetry_format}')
+    resumed = ga.generation > 0 and os.path.exists(stats_path)
+    profile_file = open(os.path.join(output_dir, 'profile.jsonl'), 'a' if resumed else 'w') if profiler.enabled else None
+    with StatsSink(stats_path, telemetry_format, start_generation=ga.generation) as sink:
+        while ga.generation < max_generations:
+            stats = None
+            recorded = False
+            try:
+                start = time.perf_counter()
+                ga.evolve()
+                stats = ga.get_statistics()
+                evolve_s = time.perf_counter() - start
+                
+                # Simulate the current population in the shared multi-animat world
+                start = time.perf_counter()
+                animats = create_animats(env, ga.population)
+                stats['steps'] = run_generation(env, animats)
+                stats['survivors'] = sum(animat.alive for animat in animats)
+                
+                sink.record(stats, ga.last_fitnesses,
+                            {'evolve_s': evolve_s, 'world_s': time.perf_counter() - start})
+                recorded = True
+                if ga.best_log is not None:
+                    ga.best_log.save(os.path.join(output_dir, 'best_run.npz'))
+                if profile_file is not None:
+                    profiler.write_jsonl(profile_file, profiler.end_generation(stats['generation']))
+                    profile_file.flush()
+                print(f"Generation {stats['generation']}: "
+                      f"Best={stats['best_fitness']:.3f}, "
+                      f"Avg={stats['avg_fitness']:.3f}, "
+                      f"Min={stats['min_fitness']:.3f}"
+                      + (f", Estimated={stats['estimated_fitnesses']}" if 'estimated_fitnesses' in stats else "")
+                      + (f", Surrogate rho={stats['surrogate_accuracy']:.2f}, Screened={stats['candidates_screened']}"
+                         if 'candidates_screened' in stats else ""))
+                save_progress(ga, env, output_dir, checkpoint_every)
+            except KeyboardInterrupt:
+                if stats is None:
+                    # Drop the statistics of the interrupted evolution and keep what finished
+                    for history in (ga.best_fitness_history, ga.avg_fitness_history, ga.min_fitness_history,
+                                    ga.estimated_history):
+                        del history[ga.generation:]
+                elif not recorded:
+                    # The generation evolved but its world run was cut short, so it has no world statistics
+                    stats['steps'] = stats['survivors'] = None
+                    sink.record(stats, ga.last_fitnesses, {'evolve_s': evolve_s, 'world_s': None})
+                save_progress(ga, env, output_dir, checkpoint_every, force=True)
+                raise
+    
+    if profile_file is not None:
+        profile_file.close()
+        print(profiler.format_table())
+    ga.close()
+
+def parse_args(argv=None):
+    """Parse the command line arguments"""
+    parser = argparse.ArgumentParser(description="Evolve animats in a multi-agent world")
+    parser.add_argument('--headless', action='store_true',
+                        help="Run without pygame or matplotlib and write statistics to --output")
+    parser.add_argument('--animats', type=int, help="Number of animats (prompted for if omitted)")
+    parser.add_argument('--generations', type=int, default=200, help="Number of generations to evolve")
+    parser.add_argument('--seed', type=int, help="Random seed for a reproducible run")
+    parser.add_argument('--output', default='output',
+                        help="Directory for headless statistics, checkpoints and the generation archive")
+    parser.add_argument('--checkpoint-every', type=int, default=0, metavar='N',
+                        help="Write <output>/checkpoint.npz every N generations")
+    parser.add_argument('--resume', metavar='CHECKPOINT', help="Continue a run from a checkpoint file")
+    parser.add_argument('--archive', action='store_true',
+                        help="Append every generation's genomes and fitnesses to <output>/archive")
+    parser.add_argument('--halving-rungs', nargs='*', type=int, metavar='STEPS',
+                        help="Evaluate by successive halving over these horizons (default HALVING_RUNGS)")
+    parser.add_argument('--record', action='store_true',
+                        help="Log each generation's best fitness run; headless runs write it to <output>/best_run.npz")
+    parser.add_argument('--steady-state', nargs='?', type=int, const=STEADY_STATE_BATCH, metavar='BATCH',
+                        help="Replace the worst BATCH genomes with new offspring per generation "
+                             "instead of the whole population (default STEADY_STATE_BATCH)")
+    parser.add_argument('--layouts', type=int, metavar='K',
+                        help="Evaluate every genome on the same K seeded worlds per generation (default LAYOUT_COUNT)")
+    parser.add_argument('--surrogate', action='store_true',
+                        help="Oversample offspring and simulate only those a fitness model ranks best")
+    parser.add_argument('--islands', type=int, metavar='K',
+                        help="Evolve K sub-populations in separate processes with periodic migration")
+    parser.add_argument('--topology', choices=TOPOLOGIES, help="Migration topology of --islands (default MIGRATION_TOPOLOGY)")
+    parser.add_argument('--telemetry-format', choices=TELEMETRY_FORMATS,
+                        help="Format of the headless <output>/statistics file (default TELEMETRY_FORMAT)")
+    parser.add_argument('--profile', action='store_true',
+                        help="Time each simulation phase; headless runs write profile.jsonl to --output")
+    args = parser.parse_args(argv)
+    if args.headless and args.animats is None:
+        parser.error("--headless requires --animats")
+    if args.animats is not None and args.animats < 1:
+        parser.error("--animats must be at least 1")
+    if args.islands and (args.resume or args.checkpoint_every or args.archive or args.record or args.halving_rungs
+                         or args.surrogate or args.steady_state):
+        parser.error("--islands cannot be combined with checkpoints, the archive, --record, --halving-rungs, "
+                     "--surrogate or --steady-state")
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.seed is not None:
+        random.seed(args.seed)
+    if args.profile:
+        profiler.enable()
+    
+    if args.headless:
+        env = Environment(args.animats)
+        ga = create_ga(args, env)
+        run_headless(ga, env, args.generations, args.output, args.checkpoint_every, args.telemetry_format)
+        return
+    
+    # Imported here so headless runs and process pool workers, which re-import this module, stay free of pygame
+    from visualization import Visualizer
+    
     # Get number of animats
-    num_animats = get_num_animats()
+    num_animats = args.animats or get_num_animats()
     
     # Initialize environment and genetic algorithm
     env = Environment(num_animats)
-    ga = GeneticAlgorithm()
-    ga.initialize_population()
+    ga = create_ga(args, env)
     
     # Initialize visualization
     visualizer = Visualizer(env.size)
     
+    # Evolve in the background while the window shows the previous generation. The worker only copies
+    # the GA state to checkpoint; it is saved here, as this thread owns the world and draws from random too
+    worker = EvolutionWorker(
+        ga, args.generations,
+        on_generation=checkpoint_state if args.checkpoint_every else None
+    ).start()
+    
     # Main simulation loop
-    running = True
-    generation = 0
-    max_generations = 200
-    
-    while running and generation < max_generations:
-        # Handle events
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-            elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_ESCAPE:
-                    running = False
-        
-        # Evolve population
-        ga.evolve()
-        stats = ga.get_statistics()
-        print(f"Generation {stats['generation']}: "
-              f"Best={stats['best_fitness']:.3f}, "
-              f"Avg={stats['avg_fitness']:.3f}, "
-              f"Min={stats['min_fitness']:.3f}")
-        
-        # Create animats from current population
-        animats = [Animat(genome=genome) for genome in ga.population[:num_animats]]
-        
-        # Simulation loop for current generation
-        step = 0
-        while step < ANIMAT_MAX_LIFESPAN and any(animat.alive for animat in animats):
-            # Update animats multiple times per frame for faster simulation
-            for _ in range(SIMULATION_SPEED):
-                # Update animats
-                for animat in animats:
-                    if animat.alive:
-                        animat.update(env, animats)
-                
-                # Check for animat collisions
-                for i in range(len(animats)):
-                    for j in range(i + 1, len(animats)):
-                        if (animats[i].alive and animats[j].alive and 
-                            env.check_animat_collision(animats[i].position, animats[j].position)):
-                            animats[i].battery1 = max(0, animats[i].battery1 - COLLISION_DAMAGE)
-                            animats[i].battery2 = max(0, animats[i].battery2 - COLLISION_DAMAGE)
-                            animats[j].battery1 = max(0, animats[j].battery1 - COLLISION_DAMAGE)
-                            animats[j].battery2 = max(0, animats[j].battery2 - COLLISION_DAMAGE)
-                
-                step += 1
-                if step >= ANIMAT_MAX_LIFESPAN or not any(animat.alive for animat in animats):
-                    break
+    try:
+        while visualizer.running:
+            try:
+                result = worker.get(timeout=1 / FPS)
+            except queue.Empty:
+                # Keep the window responsive until the next generation is ready
+                visualizer.handle_events()
+                continue
+            if result is None:
+                break
             
-            # Draw environment only every FRAME_SKIP frames
-            # if step % FRAME_SKIP == 0:
-            visualizer.draw_environment(env, animats)
-        
-        generation += 1
+            stats = result.stats
+            print(f"Generation {stats['generation']}: "
+                  f"Best={stats['best_fitness']:.3f}, "
+                  f"Avg={stats['avg_fitness']:.3f}, "
+                  f"Min={stats['min_fitness']:.3f}")
+            if result.snapshot is not None:
+                save_progress(ga, env, args.output, args.checkpoint_every, state=result.snapshot)
+            
+            # Create animats from the evolved population, recording trajectories for display
+            animats = create_animats(env, result.population, trajectories=True)
+            
+            def draw():
+                visualizer.draw_environment(env, animats)
+                return visualizer.handle_events()
+            
+            # Simulation loop for current generation
+            run_generation(env, animats, draw=draw)
+            
+            if profiler.enabled:
+                profiler.end_generation(stats['generation'])
+    finally:
+        # The worker finishes its current generation first, so keep the window responsive meanwhile
+        worker.stop()
+        while not worker.join(timeout=1 / FPS):
+            visualizer.handle_events()
+    
+    if profiler.enabled:
+        print(profiler.format_table())
     
     # Plot final statistics
     visualizer.plot_statistics(ga)
     visualizer.close()
+    ga.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,85 @@
+import multiprocessing
+import os
+import random
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from config import *
+from genetic import FitnessRun
+from layouts import LayoutPool
+
+# The LayoutPool of the current generation, rebuilt in each worker only when the seeds change
+_layout_pool = None
+
+def _get_layouts(layout_seeds):
+    """Get the LayoutPool for the given seeds, reusing the worker's last one if they match"""
+    global _layout_pool
+    if _layout_pool is None or _layout_pool.seeds != list(layout_seeds):
+        _layout_pool = LayoutPool(layout_seeds)
+    return _layout_pool
+
+def _evaluate_chunk(genome_buffer, seeds, max_steps=None, layout_seeds=None):
+    """Worker task: simulate a chunk of genomes packed as a uint8 buffer.
+
+    With layout seeds, each genome runs one episode per layout, in order.
+    Returns a (fitness, alive) pair per genome, with the mean fitness of its
+    episodes and whether any of them is still alive.
+    """
+    genomes = np.frombuffer(genome_buffer, dtype=np.uint8).reshape(-1, GENOME_LENGTH)
+    layouts = _get_layouts(layout_seeds) if layout_seeds else [None]
+    results = []
+    for genome, seed in zip(genomes, seeds):
+        random.seed(seed)
+        fitness = 0.0
+        alive = False
+        for layout in layouts:
+            run = FitnessRun(genome.tolist(), layout=layout)
+            fitness += run.advance(max_steps or ANIMAT_MAX_LIFESPAN)
+            alive = alive or run.alive
+        results.append((fitness / len(layouts), alive))
+    return results
+
+class ParallelEvaluator:
+    """Process pool that runs single-animat simulations for chunks of genomes.
+
+    Genomes travel as compact uint8 buffers and every genome comes with its
+    own seed, so results only depend on the seeds and not on how tasks are
+    split across workers. Workers import only the simulation modules, never
+    pygame or matplotlib.
+    """
+    def __init__(self, workers=None, chunksize=None, start_method=None):
+        self.workers = workers or PARALLEL_WORKERS or os.cpu_count()
+        self.chunksize = chunksize or PARALLEL_CHUNKSIZE
+        context = multiprocessing.get_context(start_method or PARALLEL_START_METHOD)
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+
+    def evaluate(self, genomes, seeds, layout_seeds=None):
+        """Get the fitness of every genome, simulating each one with its seed"""
+        return [fitness for fitness, _ in self.run(genomes, seeds, layout_seeds=layout_seeds)]
+
+    def run(self, genomes, seeds, max_steps=None, layout_seeds=None):
+        """Simulate every genome with its seed for up to max_steps steps, returning (fitness, alive) pairs.
+
+        With the seeds of a LayoutPool, every genome is simulated once per layout.
+        """
+        genomes = np.asarray(genomes, dtype=np.uint8)
+        buffers = []
+        seed_chunks = []
+        for start in range(0, len(genomes), self.chunksize):
+            buffers.append(genomes[start:start + self.chunksize].tobytes())
+            seed_chunks.append(list(seeds[start:start + self.chunksize]))
+
+        results = []
+        for chunk in self.pool.map(_evaluate_chunk, buffers, seed_chunks, [max_steps] * len(buffers),
+                                   [layout_seeds] * len(buffers)):
+            results.extend(chunk)
+        return results
+
+    def close(self):
+        """Shut down the worker processes"""
+        self.pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,83 @@
+import queue
+import threading
+from config import *
+
+class GenerationResult:
+    """Snapshot of one evolved generation handed from the evolution thread to the display.
+
+    snapshot holds whatever the worker's on_generation callback returned.
+    """
+    def __init__(self, stats, population, snapshot=None):
+        self.stats = stats
+        self.population = population
+        self.snapshot = snapshot
+
+class EvolutionWorker:
+    """Runs GeneticAlgorithm.evolve() in a background thread.
+
+    After every generation the worker puts a GenerationResult on a bounded
+    queue and moves on to the next one, so the display can show generation N
+    while N + 1 is being evaluated. When the queue is full the worker waits,
+    which keeps it at most queue_size generations ahead of the display.
+    Evaluation only overlaps with rendering while it releases the GIL, as
+    the 'process' backend does while waiting for its workers and the
+    'vectorized' backend does inside NumPy.
+
+    on_generation(ga) is called in the worker thread after every generation,
+    and its return value travels with the GenerationResult. It should only
+    copy state, e.g. checkpoint.checkpoint_state, and leave anything the
+    display thread also touches, like the Environment, to the display.
+    """
+    def __init__(self, ga, max_generations, on_generation=None, queue_size=None):
+        self.ga = ga
+        self.max_generations = max_generations
+        self.on_generation = on_generation
+        self.results = queue.Queue(maxsize=queue_size or PIPELINE_QUEUE_SIZE)
+        self.stop_event = threading.Event()
+        self.error = None
+        self.thread = threading.Thread(target=self._run, name='evolution', daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def _run(self):
+        try:
+            while self.ga.generation < self.max_generations and not self.stop_event.is_set():
+                self.ga.evolve()
+                snapshot = self.on_generation(self.ga) if self.on_generation is not None else None
+                if not self._put(GenerationResult(self.ga.get_statistics(), self.ga.population.copy(), snapshot)):
+                    return
+        except BaseException as error:
+            self.error = error
+        # None tells the display that no more generations will come
+        self._put(None)
+
+    def _put(self, item):
+        """Put an item on the queue, giving up if the worker is stopped while it waits"""
+        while not self.stop_event.is_set():
+            try:
+                self.results.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def get(self, timeout=None):
+        """Get the next GenerationResult, None once evolution has finished, or raise queue.Empty on timeout.
+
+        An exception raised by evolve() is re-raised here.
+        """
+        result = self.results.get(timeout=timeout)
+        if result is None and self.error is not None:
+            raise self.error
+        return result
+
+    def stop(self):
+        """Ask the worker to stop after the current generation"""
+        self.stop_event.set()
+
+    def join(self, timeout=None):
+        """Wait up to timeout seconds for the worker to stop, returning whether it has"""
+        self.thread.join(timeout)
+        return not self.thread.is_alive()
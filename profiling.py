@@ -0,0 +1,95 @@
+import json
+import time
+
+class _Phase:
+    """Context manager timing one entry into a profiler phase"""
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.add(self.name, time.perf_counter() - self.start)
+        return False
+
+class _NullPhase:
+    """Shared do-nothing phase handed out while profiling is disabled"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NULL_PHASE = _NullPhase()
+
+class Profiler:
+    """Accumulates wall time and call counts per simulation phase.
+
+    Phases may nest, so each phase reports inclusive time. While disabled,
+    phase() returns a shared no-op context manager and nothing is recorded.
+    Timings are per process: work done in process pool workers is only
+    visible as the parent's 'genetic.evaluate' phase.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.phases = {}
+        self.cumulative = {}
+        self.history = []
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def phase(self, name):
+        """Get a context manager that times the enclosed block under name"""
+        if not self.enabled:
+            return _NULL_PHASE
+        return _Phase(self, name)
+
+    def add(self, name, seconds, calls=1):
+        """Add time and calls to a phase"""
+        for phases in (self.phases, self.cumulative):
+            totals = phases.get(name)
+            if totals is None:
+                phases[name] = [seconds, calls]
+            else:
+                totals[0] += seconds
+                totals[1] += calls
+
+    def end_generation(self, generation):
+        """Close the current generation's timings, returning them as a record"""
+        record = {
+            'generation': generation,
+            'phases': {name: {'seconds': seconds, 'calls': calls}
+                       for name, (seconds, calls) in sorted(self.phases.items())}
+        }
+        self.history.append(record)
+        self.phases = {}
+        return record
+
+    def format_table(self, phases=None):
+        """Format timings as a text table, slowest phase first"""
+        if phases is None:
+            phases = self.cumulative
+        lines = [f"{'phase':32s} {'calls':>10s} {'total s':>10s} {'per call us':>12s}"]
+        for name, (seconds, calls) in sorted(phases.items(), key=lambda item: -item[1][0]):
+            per_call = seconds / calls * 1e6 if calls else 0.0
+            lines.append(f"{name:32s} {calls:10d} {seconds:10.3f} {per_call:12.2f}")
+        return "\n".join(lines)
+
+    @staticmethod
+    def write_jsonl(f, record):
+        """Append one record as a JSON line to an open file"""
+        f.write(json.dumps(record) + "\n")
+
+# Shared profiler instrumented throughout the simulation
+profiler = Profiler()
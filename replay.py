@@ -0,0 +1,151 @@
+"""Record-and-replay logs of single-animat fitness runs.
+
+Usage:
+    python replay.py runs/seed1/best_run.npz [--plot]
+
+A SimulationLog holds everything needed to redraw one run: the initial
+object positions, the animat state after every step and every object
+respawn. Logs are written as compressed .npz files of float32 states, so
+plotting or animating a run only reads the file and never simulates again.
+"""
+import argparse
+import numpy as np
+from config import *
+from simulation import OBJECT_TYPES
+
+# Columns of a state row
+STATE_FIELDS = ('x', 'y', 'angle', 'battery1', 'battery2')
+
+class SimulationLog:
+    """Animat states and object respawns of one fitness run.
+
+    State row 0 is the animat before its first step and row k its state
+    after step k. A respawn event (k, type, slot, x, y) moved object slot of
+    a type during step k, so it is visible from state row k on.
+    """
+    def __init__(self, size=BASE_ENV_SIZE, objects=None):
+        self.size = size
+        self.objects = objects or {}
+        self.states = []
+        self.events = []
+
+    def start(self, env, animat):
+        """Attach the log to an Environment and record the initial world and animat state"""
+        self.size = env.size
+        self.objects = {obj_type: np.array(env._get_objects(obj_type), dtype=np.float64) for obj_type in OBJECT_TYPES}
+        env.recorder = self
+        self.record_step(animat)
+
+    def record_step(self, animat):
+        """Append the state of an animat"""
+        self.states.append((animat.position[0], animat.position[1], animat.angle,
+                            animat.battery1, animat.battery2))
+
+    def record_respawn(self, object_type, slot, position):
+        """Record that an object slot moved to a new position during the current step"""
+        self.events.append((len(self.states), OBJECT_TYPES.index(object_type), slot, position[0], position[1]))
+
+    def state_array(self):
+        """Get the states as a (steps + 1, len(STATE_FIELDS)) float32 array"""
+        return np.asarray(self.states, dtype=np.float32).reshape(-1, len(STATE_FIELDS))
+
+    def event_array(self):
+        """Get the respawn events as an (events, 5) float64 array"""
+        return np.asarray(self.events, dtype=np.float64).reshape(-1, 5)
+
+    def __len__(self):
+        return len(self.states)
+
+    def positions(self):
+        """Get the animat positions, including the starting one, as an (n, 2) array"""
+        return self.state_array()[:, :2]
+
+    def objects_at(self, step):
+        """Get the object positions of every type as they were at a state row"""
+        objects = {obj_type: positions.copy() for obj_type, positions in self.objects.items()}
+        for event_step, type_code, slot, x, y in self.events:
+            if event_step > step:
+                break
+            objects[OBJECT_TYPES[int(type_code)]][int(slot)] = (x, y)
+        return objects
+
+    def frames(self):
+        """Yield a (world, animat) pair for every state row, both updated in place"""
+        world = ReplayWorld(self.size, self.objects)
+        animat = ReplayAnimat()
+        events = self.events
+        next_event = 0
+        for step, state in enumerate(self.state_array().tolist()):
+            while next_event < len(events) and events[next_event][0] <= step:
+                _, type_code, slot, x, y = events[next_event]
+                world.respawn(OBJECT_TYPES[int(type_code)], int(slot), (x, y))
+                next_event += 1
+            animat.set_state(state)
+            yield world, animat
+
+    def save(self, path):
+        """Write the log to a compressed .npz file"""
+        with open(path, 'wb') as f:
+            np.savez_compressed(
+                f,
+                size=np.float64(self.size),
+                states=self.state_array(),
+                events=self.event_array(),
+                **{obj_type: np.asarray(positions, dtype=np.float64) for obj_type, positions in self.objects.items()}
+            )
+
+    @classmethod
+    def load(cls, path):
+        """Read a log written by save()"""
+        with np.load(path, allow_pickle=False) as data:
+            log = cls(float(data['size']), {obj_type: data[obj_type].copy() for obj_type in OBJECT_TYPES})
+            log.states = [tuple(state) for state in data['states'].tolist()]
+            log.events = [tuple(event) for event in data['events'].tolist()]
+        return log
+
+class ReplayWorld:
+    """Environment stand-in holding the object positions of a replayed run, for Visualizer"""
+    def __init__(self, size, objects):
+        self.size = size
+        self.food_sources = np.array(objects['food'])
+        self.water_sources = np.array(objects['water'])
+        self.traps = np.array(objects['trap'])
+        self.version = 0
+
+    def respawn(self, object_type, slot, position):
+        """Move an object slot to a new position"""
+        {'food': self.food_sources, 'water': self.water_sources, 'trap': self.traps}[object_type][slot] = position
+        self.version += 1
+
+class ReplayAnimat:
+    """Animat stand-in holding one logged state, for Visualizer"""
+    __slots__ = ('position', 'angle', 'battery1', 'battery2', 'alive')
+
+    def __init__(self):
+        self.position = (0.0, 0.0)
+        self.angle = 0.0
+        self.battery1 = BATTERY_MAX
+        self.battery2 = BATTERY_MAX
+        self.alive = True
+
+    def set_state(self, state):
+        x, y, self.angle, self.battery1, self.battery2 = state
+        self.position = (x, y)
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded animat run")
+    parser.add_argument('log', help="Log file written with --record, e.g. <output>/best_run.npz")
+    parser.add_argument('--plot', action='store_true', help="Plot the trajectory instead of animating it")
+    args = parser.parse_args()
+
+    from visualization import Visualizer
+    log = SimulationLog.load(args.log)
+    if args.plot:
+        Visualizer.plot_run(log)
+        return
+    visualizer = Visualizer(int(log.size))
+    visualizer.replay(log)
+    visualizer.close()
+
+if __name__ == "__main__":
+    main()
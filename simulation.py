@@ -0,0 +1,214 @@
+import numpy as np
+import random
+from config import *
+from controller import CompiledController, NUM_LINKS
+
+OBJECT_TYPES = ('food', 'water', 'trap')
+
+class PopulationSimulator:
+    """Simulate many genomes in lockstep, each animat alone in its own world.
+
+    Every individual gets the same setup as GeneticAlgorithm.evaluate_fitness:
+    a fresh Environment with one animat, stepped until it dies or reaches
+    ANIMAT_MAX_LIFESPAN. All state lives in NumPy arrays indexed by individual
+    and is advanced for the whole population at once.
+
+    With a LayoutPool, row i starts in layout layout_ids[i] and respawns its
+    objects at that layout's positions; the stacked layout arrays are
+    gathered once instead of drawing new worlds.
+    """
+    def __init__(self, genomes, num_animats=1, rng=None, record=False, layouts=None, layout_ids=None):
+        genomes = np.asarray(genomes, dtype=np.uint8)
+        self.rng = rng if rng is not None else np.random.default_rng(random.getrandbits(64))
+        self.n = len(genomes)
+        self.num_animats = num_animats
+        self.size = BASE_ENV_SIZE * num_animats
+        self.sensor_range = BASE_SENSOR_RANGE * num_animats
+
+        # Sensorimotor links of every genome, decoded once
+        self.controller = CompiledController(genomes)
+
+        # Animat state
+        self.layouts = layouts
+        if layouts is None:
+            self.x = self.rng.uniform(0, BASE_ENV_SIZE, self.n)
+            self.y = self.rng.uniform(0, BASE_ENV_SIZE, self.n)
+            self.angle = self.rng.uniform(0, 2 * np.pi, self.n)
+        else:
+            self.layout_ids = np.asarray(layout_ids, dtype=np.int64)
+            self.x, self.y, self.angle = layouts.starts[self.layout_ids].T.copy()
+        self.battery1 = np.full(self.n, float(BATTERY_MAX))
+        self.battery2 = np.full(self.n, float(BATTERY_MAX))
+        self.alive = np.ones(self.n, dtype=bool)
+        self.stuck_counter = np.zeros(self.n, dtype=np.int64)
+        self.sensors = np.zeros((self.n, NUM_LINKS))
+
+        # Per-individual worlds: object positions of shape (n, count, 2)
+        counts = {
+            'food': BASE_FOOD_COUNT * num_animats,
+            'water': BASE_WATER_COUNT * num_animats,
+            'trap': BASE_TRAP_COUNT * num_animats
+        }
+        if layouts is None:
+            self.objects = {obj_type: self._generate_objects((self.n, count)) for obj_type, count in counts.items()}
+        else:
+            self.objects = {obj_type: layouts.objects[obj_type][self.layout_ids] for obj_type in OBJECT_TYPES}
+            self.respawn_counts = {obj_type: np.zeros(self.n, dtype=np.int64) for obj_type in layouts.respawns}
+            self.turn_counts = np.zeros(self.n, dtype=np.int64)
+
+        # Fitness accumulators
+        self.total_fitness = np.zeros(self.n)
+        self.steps = np.zeros(self.n, dtype=np.int64)
+        self.step_count = 0
+
+        # Optional history of every individual's state and respawns, for get_log()
+        self.record = record
+        if record:
+            self.initial_objects = {obj_type: objects.copy() for obj_type, objects in self.objects.items()}
+            self.state_history = [self._state()]
+            self.respawns = []
+
+    def _generate_objects(self, shape):
+        """Generate random object positions of the given leading shape"""
+        return self.rng.uniform(OBJECT_PLACEMENT_PADDING, self.size - OBJECT_PLACEMENT_PADDING, shape + (2,))
+
+    def _respawn_positions(self, obj_type, rows):
+        """Get the positions the consumed objects of a type respawn at, one per given row"""
+        if self.layouts is None:
+            return self._generate_objects((len(rows),))
+        positions = self.layouts.respawns[obj_type]
+        counts = self.respawn_counts[obj_type][rows]
+        self.respawn_counts[obj_type][rows] += 1
+        return positions[self.layout_ids[rows], counts % positions.shape[1]]
+
+    def _turn_angles(self, turning):
+        """Get new angles for stuck individuals: the next ones of their layouts' turns where turning, or random ones"""
+        if self.layouts is None:
+            return self.rng.uniform(0, 2 * np.pi, self.n)
+        angles = np.zeros(self.n)
+        rows = np.flatnonzero(turning)
+        turns = self.layouts.turns
+        angles[rows] = turns[self.layout_ids[rows], self.turn_counts[rows] % turns.shape[1]]
+        self.turn_counts[rows] += 1
+        return angles
+
+    def _state(self):
+        """Get the (n, 5) x, y, angle, battery1, battery2 state of every individual"""
+        return np.stack((self.x, self.y, self.angle, self.battery1, self.battery2), axis=1).astype(np.float32)
+
+    def _nearest(self, obj_type):
+        """Get the index and distance of the nearest object of a type for every individual"""
+        objects = self.objects[obj_type]
+        dx = objects[:, :, 0] - self.x[:, None]
+        dy = objects[:, :, 1] - self.y[:, None]
+        distances = np.sqrt(dx**2 + dy**2)
+        nearest = np.argmin(distances, axis=1)
+        rows = np.arange(self.n)
+        return nearest, distances[rows, nearest], dx[rows, nearest], dy[rows, nearest]
+
+    def update_sensors(self):
+        """Update the food, water and trap sensors of every individual"""
+        for i, obj_type in enumerate(OBJECT_TYPES):
+            _, dist, dx, dy = self._nearest(obj_type)
+            relative_angle = (np.arctan2(dy, dx) - self.angle) % (2 * np.pi)
+            sensor_value = np.maximum(0, 100 * (1 - dist / self.sensor_range))
+            on_left = relative_angle < np.pi
+            self.sensors[:, 2*i] = np.where(on_left, sensor_value * 1.2, sensor_value)
+            self.sensors[:, 2*i + 1] = np.where(on_left, sensor_value, sensor_value * 1.2)
+
+    def process_sensorimotor_links(self):
+        """Get the wheel speeds of every individual from its sensors"""
+        return self.controller.wheel_speeds(self.sensors, self.battery1, self.battery2)
+
+    def step(self):
+        """Advance every living individual by one time step"""
+        active = self.alive.copy()
+
+        self.update_sensors()
+        left_speed, right_speed = self.process_sensorimotor_links()
+
+        # Calculate movement
+        speed = (left_speed + right_speed) / 2 * ANIMAT_MAX_SPEED
+        rotation = (right_speed - left_speed) * np.pi / 4
+        angle = (self.angle + rotation) % (2 * np.pi)
+        new_x = np.clip(self.x + speed * np.cos(angle), 0, self.size)
+        new_y = np.clip(self.y + speed * np.sin(angle), 0, self.size)
+
+        # Turn stuck individuals randomly
+        stuck = np.sqrt((new_x - self.x)**2 + (new_y - self.y)**2) < 0.1
+        stuck_counter = np.where(stuck, self.stuck_counter + 1, 0)
+        turn = stuck_counter > STUCK_THRESHOLD
+        if turn.any():
+            angle = np.where(turn, self._turn_angles(turn & active), angle)
+            stuck_counter[turn] = 0
+
+        self.angle = np.where(active, angle, self.angle)
+        self.x = np.where(active, new_x, self.x)
+        self.y = np.where(active, new_y, self.y)
+        self.stuck_counter = np.where(active, stuck_counter, self.stuck_counter)
+
+        # Update batteries
+        self.battery1 = np.where(active, np.maximum(0, self.battery1 - BATTERY_DECAY_RATE), self.battery1)
+        self.battery2 = np.where(active, np.maximum(0, self.battery2 - BATTERY_DECAY_RATE), self.battery2)
+        self.alive &= ~((self.battery1 <= 0) & (self.battery2 <= 0))
+
+        # Check collisions
+        for obj_type in OBJECT_TYPES:
+            nearest, dist, _, _ = self._nearest(obj_type)
+            collided = active & (dist < SOURCE_SIZE + ANIMAT_SIZE)
+            if not collided.any():
+                continue
+            if obj_type == 'trap':
+                self.alive[collided] = False
+                self.battery1[collided] = 0
+                self.battery2[collided] = 0
+            else:
+                if obj_type == 'food':
+                    self.battery1[collided] = BATTERY_MAX
+                else:
+                    self.battery2[collided] = BATTERY_MAX
+                rows = np.flatnonzero(collided)
+                new_positions = self._respawn_positions(obj_type, rows)
+                self.objects[obj_type][rows, nearest[rows]] = new_positions
+                if self.record:
+                    self.respawns.append((self.step_count + 1, OBJECT_TYPES.index(obj_type),
+                                          rows, nearest[rows], new_positions))
+
+        # Accumulate fitness of individuals that took this step
+        self.total_fitness[active] += (self.battery1[active] + self.battery2[active]) / (2 * BATTERY_MAX)
+        self.steps[active] += 1
+        self.step_count += 1
+        if self.record:
+            self.state_history.append(self._state())
+
+    def retire(self, rows):
+        """Stop simulating the given individuals, keeping their fitness so far"""
+        self.alive[rows] = False
+
+    def run(self, max_steps=None):
+        """Step until every individual is dead or max_steps is reached, then return fitnesses"""
+        max_steps = max_steps or ANIMAT_MAX_LIFESPAN
+        while self.step_count < max_steps and self.alive.any():
+            self.step()
+        return self.get_fitness()
+
+    def get_log(self, row):
+        """Build the SimulationLog of one individual's run; needs record=True"""
+        from replay import SimulationLog
+
+        last = int(self.steps[row])
+        log = SimulationLog(self.size, {obj_type: objects[row].copy()
+                                        for obj_type, objects in self.initial_objects.items()})
+        log.states = [tuple(states[row]) for states in np.array(self.state_history[:last + 1]).tolist()]
+        for step, type_code, rows, slots, positions in self.respawns:
+            if step > last:
+                break
+            for i in np.flatnonzero(rows == row):
+                log.events.append((step, type_code, int(slots[i]), positions[i, 0], positions[i, 1]))
+        return log
+
+    def get_fitness(self):
+        """Get the average battery fitness of every individual"""
+        fitness = np.zeros(self.n)
+        np.divide(self.total_fitness, self.steps, out=fitness, where=self.steps > 0)
+        return fitness
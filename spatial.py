@@ -0,0 +1,453 @@
+import math
+import numpy as np
+from config import *
+
+class SpatialGrid:
+    """Uniform grid hashing item ids into square cells.
+
+    Answers nearest-item and overlap queries by scanning only the cells
+    around the query point, so their cost depends on the local item density
+    rather than on the total number of items.
+    """
+    def __init__(self, size, cell_size, origin=(0.0, 0.0)):
+        self.size = size
+        self.cell_size = cell_size
+        self.origin = origin
+        self.cells_per_side = max(1, int(math.ceil(size / cell_size)))
+        self.cells = {}
+        self.positions = {}
+
+    def _cell(self, position):
+        """Get the grid cell containing a position, clamped to the grid"""
+        last = self.cells_per_side - 1
+        cx = min(last, max(0, int((position[0] - self.origin[0]) // self.cell_size)))
+        cy = min(last, max(0, int((position[1] - self.origin[1]) // self.cell_size)))
+        return cx, cy
+
+    def insert(self, item_id, position):
+        """Add an item at a position"""
+        self.positions[item_id] = position
+        self.cells.setdefault(self._cell(position), []).append(item_id)
+
+    def remove(self, item_id):
+        """Remove an item"""
+        cell = self._cell(self.positions.pop(item_id))
+        items = self.cells[cell]
+        items.remove(item_id)
+        if not items:
+            del self.cells[cell]
+
+    def move(self, item_id, position):
+        """Move an item to a new position"""
+        self.remove(item_id)
+        self.insert(item_id, position)
+
+    def copy(self):
+        """Get an independent copy of the grid"""
+        grid = SpatialGrid(self.size, self.cell_size, self.origin)
+        grid.cells = {cell: items.copy() for cell, items in self.cells.items()}
+        grid.positions = self.positions.copy()
+        return grid
+
+    def find(self, position):
+        """Get the id of the item stored at exactly this position, or None"""
+        for item_id in self.cells.get(self._cell(position), ()):
+            if self.positions[item_id] == position:
+                return item_id
+        return None
+
+    def _ring(self, cx, cy, r):
+        """Yield the in-grid cells at Chebyshev distance r from (cx, cy)"""
+        if r == 0:
+            yield cx, cy
+            return
+        last = self.cells_per_side - 1
+        for x in range(max(0, cx - r), min(last, cx + r) + 1):
+            if cy - r >= 0:
+                yield x, cy - r
+            if cy + r <= last:
+                yield x, cy + r
+        for y in range(max(0, cy - r + 1), min(last, cy + r - 1) + 1):
+            if cx - r >= 0:
+                yield cx - r, y
+            if cx + r <= last:
+                yield cx + r, y
+
+    def nearest(self, position):
+        """Get the id of the nearest item and its distance, or (None, inf) if empty"""
+        if not self.positions:
+            return None, float('inf')
+
+        px, py = position
+        cx, cy = self._cell(position)
+        last = self.cells_per_side - 1
+        max_ring = max(cx, last - cx, cy, last - cy)
+        best_id = None
+        best_dist_sq = float('inf')
+
+        for r in range(max_ring + 1):
+            for cell in self._ring(cx, cy, r):
+                for item_id in self.cells.get(cell, ()):
+                    x, y = self.positions[item_id]
+                    dist_sq = (x - px)**2 + (y - py)**2
+                    if dist_sq < best_dist_sq:
+                        best_id = item_id
+                        best_dist_sq = dist_sq
+            # Every cell in ring r + 1 is at least r cells away from the query point
+            if best_id is not None and best_dist_sq <= (r * self.cell_size)**2:
+                break
+
+        return best_id, math.sqrt(best_dist_sq)
+
+    def first_within(self, position, radius):
+        """Get the id of an item closer than radius to position, or None"""
+        px, py = position
+        radius_sq = radius**2
+        min_cx, min_cy = self._cell((px - radius, py - radius))
+        max_cx, max_cy = self._cell((px + radius, py + radius))
+
+        for cx in range(min_cx, max_cx + 1):
+            for cy in range(min_cy, max_cy + 1):
+                for item_id in self.cells.get((cx, cy), ()):
+                    x, y = self.positions[item_id]
+                    if (x - px)**2 + (y - py)**2 < radius_sq:
+                        return item_id
+        return None
+
+def segment_min(values, counts):
+    """Get the minimum of each consecutive run of values with the given lengths, inf for empty runs"""
+    result = np.full(len(counts), np.inf)
+    nonempty = counts > 0
+    if len(values):
+        starts = np.cumsum(counts) - counts
+        result[nonempty] = np.minimum.reduceat(values, starts[nonempty])
+    return result
+
+class CellTable:
+    """Read-only snapshot of points sorted by grid cell, for vectorized queries of many positions at once.
+
+    A query gathers the ids of the points in the (2 * reach + 1)^2 cells
+    around each position. Any point outside them is at least reach cells
+    away, so a nearest point found within reach * cell_size is exact; the
+    caller widens the search or falls back to an exact one for the rest.
+    """
+    OFFSET = 1 << 31  # Shifts cell coordinates to non-negative values before packing them into one key
+
+    def __init__(self, points, cell_size, origin=(0.0, 0.0)):
+        self.points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        self.cell_size = cell_size
+        self.origin = np.asarray(origin, dtype=np.float64)
+        keys = self._keys(self._cells(self.points))
+        self.order = np.argsort(keys, kind='stable')
+        self.keys = keys[self.order]
+
+    def _cells(self, positions):
+        return np.floor((positions - self.origin) / self.cell_size).astype(np.int64)
+
+    def _keys(self, cells):
+        return ((cells[..., 0] + self.OFFSET) << 32) | (cells[..., 1] + self.OFFSET)
+
+    def pairs(self, positions, reach=1):
+        """Get the (row, id) pairs of the points in the cells around each position.
+
+        Returns the query rows and point ids of the pairs, grouped by row, and
+        the number of pairs of every row.
+        """
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        offsets = np.arange(-reach, reach + 1)
+        # Neighbouring cells differ from the position's cell by a constant key offset
+        deltas = ((offsets[:, None] << 32) + offsets[None, :]).ravel()
+        keys = self._keys(self._cells(positions))[:, None] + deltas
+        starts = np.searchsorted(self.keys, keys, 'left').ravel()
+        counts = np.searchsorted(self.keys, keys, 'right').ravel() - starts
+        # Consecutive picks within each cell's run of sorted points
+        picks = np.repeat(starts - (np.cumsum(counts) - counts), counts) + np.arange(counts.sum())
+        row_counts = counts.reshape(len(positions), len(deltas)).sum(axis=1)
+        return np.repeat(np.arange(len(positions)), row_counts), self.order[picks], row_counts
+
+    def nearest(self, positions, reach=1, exclude=None):
+        """Get the id of the nearest point to each position and its squared distance, and whether it is exact.
+
+        Rows without a point around them get id -1 and distance inf. Ids in
+        exclude, one per position, are skipped.
+        """
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        rows, ids, counts = self.pairs(positions, reach)
+        dx = self.points[ids, 0] - positions[rows, 0]
+        dy = self.points[ids, 1] - positions[rows, 1]
+        dist_sq = dx**2 + dy**2
+        if exclude is not None:
+            dist_sq[ids == np.asarray(exclude)[rows]] = np.inf
+        best = segment_min(dist_sq, counts)
+        # The first pair of each row that reaches the row's minimum
+        hits = np.flatnonzero((dist_sq == best[rows]) & np.isfinite(dist_sq))
+        first = np.ones(len(hits), dtype=bool)
+        first[1:] = rows[hits[1:]] != rows[hits[:-1]]
+        nearest = np.full(len(positions), -1, dtype=np.int64)
+        nearest[rows[hits[first]]] = ids[hits[first]]
+        return nearest, best, best <= (reach * self.cell_size)**2
+
+class NearestField:
+    """Raster of the two items nearest to the centre of every cell, for constant-time nearest queries.
+
+    Every cell stores the nearest and second-nearest item to its centre among
+    the items within radius of it, with their distances. A query reads the
+    nearest item of its cell and computes the exact distance to it. No other
+    item can be closer when that distance is below the cell's second-nearest
+    distance minus its half-diagonal. Otherwise nearest() returns None and
+    the caller falls back to an exact search. Items are ids 0..n-1, and
+    moving one only recomputes the cells within radius of its old and new
+    positions.
+    """
+    def __init__(self, size, cell_size, radius, positions=()):
+        self.size = size
+        self.cell_size = cell_size
+        self.radius = radius
+        self.cells_per_side = max(1, int(math.ceil(size / cell_size)))
+        self.half_diagonal = cell_size * math.sqrt(2) / 2
+        self.centres = (np.arange(self.cells_per_side) + 0.5) * cell_size
+        shape = (self.cells_per_side, self.cells_per_side)  # Indexed [cy, cx]
+        self.first = np.full(shape, -1, dtype=np.int64)
+        self.first_dist = np.full(shape, float(radius))
+        self.second = np.full(shape, -1, dtype=np.int64)
+        self.second_dist = np.full(shape, float(radius))
+        self.points = [tuple(position) for position in positions]
+        self.coords = np.array(self.points, dtype=np.float64).reshape(-1, 2)  # The points as an (n, 2) array
+        for item_id in range(len(self.points)):
+            self._insert(item_id)
+
+    def copy(self):
+        """Get an independent copy of the field"""
+        field = NearestField.__new__(NearestField)
+        field.__dict__.update(self.__dict__)
+        for name in ('first', 'first_dist', 'second', 'second_dist', 'coords'):
+            setattr(field, name, getattr(self, name).copy())
+        field.points = list(self.points)
+        return field
+
+    def _window(self, position):
+        """Get the row and column slices of the cells whose centres may lie within radius of a position"""
+        last = self.cells_per_side - 1
+        lo_x = min(last, max(0, int((position[0] - self.radius) // self.cell_size)))
+        hi_x = min(last, max(0, int((position[0] + self.radius) // self.cell_size)))
+        lo_y = min(last, max(0, int((position[1] - self.radius) // self.cell_size)))
+        hi_y = min(last, max(0, int((position[1] + self.radius) // self.cell_size)))
+        return slice(lo_y, hi_y + 1), slice(lo_x, hi_x + 1)
+
+    def _enter(self, item_id, rows, cols, first, first_dist, second, second_dist):
+        """Enter an item into a window of cells, given the window's slices and arrays"""
+        x, y = self.points[item_id]
+        dist = np.sqrt((self.centres[rows, None] - y)**2 + (self.centres[None, cols] - x)**2)
+        # Whole-window np.where is much cheaper than boolean-mask assignment; the arrays may be views
+        new_first = dist < first_dist
+        new_second = ~new_first & (dist < second_dist)
+        second[...] = np.where(new_first, first, np.where(new_second, item_id, second))
+        second_dist[...] = np.where(new_first, first_dist, np.where(new_second, dist, second_dist))
+        first[...] = np.where(new_first, item_id, first)
+        first_dist[...] = np.where(new_first, dist, first_dist)
+
+    def _insert(self, item_id):
+        """Enter an item into the cells around its position"""
+        rows, cols = self._window(self.points[item_id])
+        self._enter(item_id, rows, cols, self.first[rows, cols], self.first_dist[rows, cols],
+                    self.second[rows, cols], self.second_dist[rows, cols])
+
+    def _remove(self, item_id):
+        """Recompute the cells that list an item, leaving it out"""
+        x, y = self.points[item_id]
+        rows, cols = self._window((x, y))
+        first, first_dist = self.first[rows, cols], self.first_dist[rows, cols]
+        second, second_dist = self.second[rows, cols], self.second_dist[rows, cols]
+        was_first = first == item_id
+        stale = was_first | (second == item_id)
+        if not stale.any():
+            return
+
+        # The other listed item is still the nearest remaining one, so it becomes (or stays) first
+        # and only the second slot is searched for, among the items that can reach the window
+        first[...] = np.where(was_first, second, first)
+        first_dist[...] = np.where(was_first, second_dist, first_dist)
+        best = np.full(stale.shape, -1, dtype=np.int64)
+        best_dist = np.full(stale.shape, float(self.radius))
+        reach_sq = (2 * self.radius + 2 * self.half_diagonal)**2
+        near = ((self.coords[:, 0] - x)**2 + (self.coords[:, 1] - y)**2) < reach_sq
+        near[item_id] = False
+        for other in np.flatnonzero(near).tolist():
+            ox, oy = self.points[other]
+            dist = np.sqrt((self.centres[rows, None] - oy)**2 + (self.centres[None, cols] - ox)**2)
+            closer = (dist < best_dist) & (first != other)
+            best = np.where(closer, other, best)
+            best_dist = np.where(closer, dist, best_dist)
+        second[...] = np.where(stale, best, second)
+        second_dist[...] = np.where(stale, best_dist, second_dist)
+
+    def move(self, item_id, position):
+        """Move an item to a new position"""
+        self._remove(item_id)
+        self.points[item_id] = tuple(position)
+        self.coords[item_id] = position
+        self._insert(item_id)
+
+    def nearest(self, position):
+        """Get the id of the nearest item and its distance if the field can vouch for it, otherwise None"""
+        px, py = position
+        cx = int(px // self.cell_size)
+        cy = int(py // self.cell_size)
+        if not (0 <= cx < self.cells_per_side and 0 <= cy < self.cells_per_side):
+            return None
+        item_id = self.first.item(cy, cx)
+        if item_id < 0:
+            return None
+        x, y = self.points[item_id]
+        dist_sq = (x - px)**2 + (y - py)**2
+        limit = self.second_dist.item(cy, cx) - self.half_diagonal
+        if limit <= 0 or dist_sq >= limit * limit:
+            return None
+        return item_id, math.sqrt(dist_sq)
+
+class NeighborIndex:
+    """Grid of the living animats' positions, built once per simulation step.
+
+    The grid covers only the bounding box of the animats, with cells sized
+    for about one animat each but never smaller than a collision, so both
+    the 'other' sensors and animat collision checks look at a few cells
+    instead of every other animat.
+    """
+    def __init__(self, animats):
+        self.animats = animats
+        living = [i for i, animat in enumerate(animats) if animat.alive]
+        if living:
+            xs = [animats[i].position[0] for i in living]
+            ys = [animats[i].position[1] for i in living]
+            origin = (min(xs), min(ys))
+            extent = max(max(xs) - origin[0], max(ys) - origin[1], 1.0)
+        else:
+            origin, extent = (0.0, 0.0), 1.0
+        cell_size = max(ANIMAT_SIZE * 2, extent / max(1, len(living))**0.5)
+        self.grid = SpatialGrid(extent, cell_size, origin)
+        for i in living:
+            # Snapshot the position: animats update theirs in place
+            self.grid.insert(i, tuple(animats[i].position))
+        self.living = np.array(living, dtype=np.int64)
+        self.table = None  # CellTable of the same positions, built on the first batch query
+
+    def nearest_by_side(self, animat, max_distance):
+        """Get the distances to the nearest other living animat on the left and on the right.
+
+        Sides follow the sensor convention: an animat is on the left when its
+        bearing relative to the heading lies in [0, pi). Animats at or beyond
+        max_distance are ignored; a missing side is reported as None.
+        """
+        grid = self.grid
+        px, py = animat.position
+        cx, cy = grid._cell(animat.position)
+        last = grid.cells_per_side - 1
+        max_ring = max(cx, last - cx, cy, last - cy)
+        best = [max_distance**2, max_distance**2]
+        found = [False, False]
+
+        for r in range(max_ring + 1):
+            for cell in grid._ring(cx, cy, r):
+                for i in grid.cells.get(cell, ()):
+                    other = self.animats[i]
+                    if other is animat:
+                        continue
+                    x, y = grid.positions[i]
+                    dist_sq = (x - px)**2 + (y - py)**2
+                    side = 0 if (math.atan2(y - py, x - px) - animat.angle) % (2 * math.pi) < math.pi else 1
+                    if dist_sq < best[side]:
+                        best[side] = dist_sq
+                        found[side] = True
+            # Every cell in ring r + 1 is at least r cells away from the query point
+            reach_sq = (r * grid.cell_size)**2
+            if reach_sq >= best[0] and reach_sq >= best[1]:
+                break
+
+        return tuple(math.sqrt(best[side]) if found[side] else None for side in (0, 1))
+
+    def nearest_by_side_batch(self, rows, positions, angles, max_distance):
+        """Get nearest_by_side for many animats at once, given their indexes, positions and angles.
+
+        Returns left and right distance arrays, nan where a side is missing.
+        Each animat searches the ring of cells around its own, widening to 2,
+        4, 8 and 16 rings, and falls back to nearest_by_side if its answer may
+        still lie further away.
+        """
+        grid = self.grid
+        table = self._table()
+        rows = np.asarray(rows, dtype=np.int64)
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        angles = np.asarray(angles, dtype=np.float64)
+        left = np.full(len(rows), np.nan)
+        right = np.full(len(rows), np.nan)
+        pending = np.arange(len(rows))
+        for reach in (1, 2, 4, 8, 16):
+            if not len(pending):
+                break
+            query_rows, ids, counts = table.pairs(positions[pending], reach)
+            query_rows = pending[query_rows]
+            dx = table.points[ids, 0] - positions[query_rows, 0]
+            dy = table.points[ids, 1] - positions[query_rows, 1]
+            dist_sq = np.where(self.living[ids] != rows[query_rows], dx**2 + dy**2, np.inf)
+            on_left = (np.arctan2(dy, dx) - angles[query_rows]) % (2 * np.pi) < np.pi
+            resolved = np.ones(len(pending), dtype=bool)
+            for side, found in ((on_left, left), (~on_left, right)):
+                best = np.minimum(segment_min(np.where(side, dist_sq, np.inf), counts), float(max_distance)**2)
+                # Anything outside the searched cells is at least reach cells away, and there is
+                # nothing outside them once they cover the whole grid
+                resolved &= (best <= (reach * grid.cell_size)**2) | (reach >= grid.cells_per_side)
+                found[pending] = np.where(best < float(max_distance)**2, np.sqrt(best), np.nan)
+            pending = pending[~resolved]
+        for k in pending.tolist():
+            left[k], right[k] = (np.nan if dist is None else dist
+                                 for dist in self.nearest_by_side(self.animats[rows[k]], max_distance))
+        return left, right
+
+    def _table(self):
+        """Get the CellTable of the grid's positions, building it on first use"""
+        if self.table is None:
+            grid = self.grid
+            points = np.array([grid.positions[i] for i in self.living.tolist()], dtype=np.float64).reshape(-1, 2)
+            self.table = CellTable(points, grid.cell_size, grid.origin)
+        return self.table
+
+    def colliding_pairs(self, distance):
+        """Get the index pairs (i, j), i < j, of living animats closer than distance, as an (m, 2) array.
+
+        Fewer than BATCH_MIN_ANIMATS animats are checked cell by cell in
+        Python, which beats the vectorized query's fixed cost.
+        """
+        if len(self.living) < BATCH_MIN_ANIMATS:
+            return np.array(list(self._grid_pairs(distance)), dtype=np.int64).reshape(-1, 2)
+        table = self._table()
+        reach = max(1, int(math.ceil(distance / table.cell_size)))
+        rows, ids, _ = table.pairs(table.points, reach)
+        # Every pair is found from both ends; keep it once
+        keep = rows < ids
+        rows, ids = rows[keep], ids[keep]
+        dist_sq = ((table.points[rows] - table.points[ids])**2).sum(axis=1)
+        close = dist_sq < distance**2
+        return np.column_stack((self.living[rows[close]], self.living[ids[close]]))
+
+    def _grid_pairs(self, distance):
+        """Yield the colliding pairs by comparing the animats of neighbouring grid cells"""
+        grid = self.grid
+        distance_sq = distance**2
+        # Visit each pair of cells within reach once: the cell itself and the half of its
+        # neighbourhood that comes after it in (y, x) order
+        reach = max(1, int(math.ceil(distance / grid.cell_size)))
+        offsets = [(dx, dy) for dy in range(reach + 1) for dx in range(-reach, reach + 1)
+                   if dy > 0 or dx >= 0]
+        for (cx, cy), items in grid.cells.items():
+            for dx, dy in offsets:
+                others = grid.cells.get((cx + dx, cy + dy))
+                if not others:
+                    continue
+                for i in items:
+                    xi, yi = grid.positions[i]
+                    for j in others:
+                        if (dx, dy) == (0, 0) and j <= i:
+                            continue
+                        xj, yj = grid.positions[j]
+                        if (xi - xj)**2 + (yi - yj)**2 < distance_sq:
+                            yield (i, j) if i < j else (j, i)
@@ -0,0 +1,62 @@
+import numpy as np
+from config import *
+
+class RidgeSurrogate:
+    """Ridge regression of fitness on the genes, trained incrementally.
+
+    Only the running sums of the features, the targets and their products
+    are kept, so each update costs O(GENOME_LENGTH^2) per genome no matter
+    how many genomes have been seen. Genes are scaled to [0, 1] and the
+    intercept is not regularized.
+    """
+    def __init__(self, alpha=None):
+        self.alpha = SURROGATE_ALPHA if alpha is None else alpha
+        self.count = 0
+        self.sum_x = np.zeros(GENOME_LENGTH)
+        self.sum_y = 0.0
+        self.sum_xx = np.zeros((GENOME_LENGTH, GENOME_LENGTH))
+        self.sum_xy = np.zeros(GENOME_LENGTH)
+        self.weights = None
+        self.intercept = 0.0
+
+    @staticmethod
+    def features(genomes):
+        return np.asarray(genomes, dtype=np.float64).reshape(-1, GENOME_LENGTH) / 99.0
+
+    def update(self, genomes, fitnesses):
+        """Add (genome, fitness) pairs to the training data"""
+        x = self.features(genomes)
+        y = np.asarray(fitnesses, dtype=np.float64)
+        self.count += len(y)
+        self.sum_x += x.sum(axis=0)
+        self.sum_y += y.sum()
+        self.sum_xx += x.T @ x
+        self.sum_xy += x.T @ y
+        self.weights = None
+
+    def fit(self):
+        """Solve for the weights from the accumulated sums"""
+        mean_x = self.sum_x / self.count
+        mean_y = self.sum_y / self.count
+        centered_xx = self.sum_xx - self.count * np.outer(mean_x, mean_x)
+        centered_xy = self.sum_xy - self.count * mean_x * mean_y
+        self.weights = np.linalg.solve(centered_xx + self.alpha * np.eye(GENOME_LENGTH), centered_xy)
+        self.intercept = mean_y - mean_x @ self.weights
+
+    def predict(self, genomes):
+        """Predict the fitness of genomes; needs at least one update"""
+        if self.weights is None:
+            self.fit()
+        return self.features(genomes) @ self.weights + self.intercept
+
+def rank_correlation(predicted, actual):
+    """Spearman rank correlation of two arrays, or nan if it is undefined"""
+    predicted = np.asarray(predicted, dtype=np.float64)
+    actual = np.asarray(actual, dtype=np.float64)
+    if len(predicted) < 3:
+        return float('nan')
+    ranks_p = np.argsort(np.argsort(predicted))
+    ranks_a = np.argsort(np.argsort(actual))
+    if ranks_p.std() == 0 or ranks_a.std() == 0:
+        return float('nan')
+    return float(np.corrcoef(ranks_p, ranks_a)[0, 1])
@@ -0,0 +1,188 @@
+"""Run a grid of independent GA experiments in a process pool.
+
+Usage:
+    python sweep.py --set CROSSOVER_RATE=0.3,0.5,0.7 --set MUTATION_RATE=0.01,0.05
+                    --seeds 1 2 3 --generations 100 [--workers 4] [--output sweep.jsonl]
+
+Every combination of the --set values and seeds is one run. A run applies
+its config overrides inside its worker process, seeds the random module and
+evolves a GeneticAlgorithm headless for --generations generations. Each
+generation's statistics are streamed to the output file as one JSON line,
+and a final {"finished": true} line marks the run as complete. Restarting
+the same sweep skips finished runs and redoes the others from scratch.
+"""
+import argparse
+import ast
+import itertools
+import json
+import multiprocessing
+import os
+import queue
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import config
+from config import *
+
+# Modules whose star-imported constants are overridden along with config's
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Constants computed from other constants at import time, as in config.py and
+# layouts.py. They are recomputed from the overridden values and cannot be
+# overridden themselves
+DERIVED_CONSTANTS = {
+    'TRAJECTORY_CAPACITY': lambda c: c['ANIMAT_MAX_LIFESPAN'] + 1,
+    'FPS': lambda c: c['BASE_FPS'] * c['SIMULATION_SPEED'],
+    'OBJECT_COUNTS': lambda c: {'food': c['BASE_FOOD_COUNT'], 'water': c['BASE_WATER_COUNT'],
+                                'trap': c['BASE_TRAP_COUNT']},
+    'TURN_COUNT': lambda c: c['ANIMAT_MAX_LIFESPAN'] // (c['STUCK_THRESHOLD'] + 1) + 1,
+}
+# Constants the genome decoding is built around
+FIXED_CONSTANTS = ('GENOME_LENGTH',)
+
+def check_overrides(overrides):
+    """Raise ValueError for a constant that does not exist or cannot be overridden"""
+    for name in overrides:
+        if name in DERIVED_CONSTANTS:
+            raise ValueError(f"{name} is derived from other constants; override those instead")
+        if name in FIXED_CONSTANTS:
+            raise ValueError(f"{name} cannot be overridden")
+        if not hasattr(config, name):
+            raise ValueError(f"Unknown config constant: {name}")
+
+def apply_overrides(overrides):
+    """Set config constants in config and every loaded project module, returning the previous values.
+    
+    The DERIVED_CONSTANTS are recomputed from the new values wherever they are defined.
+    """
+    check_overrides(overrides)
+    previous = {name: getattr(config, name) for name in overrides}
+    constants = dict(vars(config), **overrides)
+    values = dict(overrides, **{name: derive(constants) for name, derive in DERIVED_CONSTANTS.items()})
+    for module in list(sys.modules.values()):
+        module_file = getattr(module, '__file__', None)
+        if not module_file or os.path.dirname(os.path.abspath(module_file)) != PROJECT_DIR:
+            continue
+        for name, value in values.items():
+            if name in vars(module):
+                setattr(module, name, value)
+    return previous
+
+def run_id(overrides, seed):
+    """Stable identifier of a run in the results file"""
+    return ",".join([f"{name}={overrides[name]!r}" for name in sorted(overrides)] + [f"seed={seed}"])
+
+def run_experiment(overrides, seed, generations, results):
+    """Worker task: evolve one configuration and put a record per generation on the results queue"""
+    # Load every module that star-imports config before patching it
+    import genetic, animat, environment, simulation, controller, spatial, layouts
+
+    previous = apply_overrides(overrides)
+    try:
+        if genetic.EVALUATION_BACKEND == 'process':
+            raise ValueError("Sweep runs already run in worker processes; use the 'serial' or 'vectorized' backend")
+        random.seed(seed)
+        ga = genetic.GeneticAlgorithm()
+        ga.initialize_population()
+        start = time.perf_counter()
+        base = {'run': run_id(overrides, seed), 'overrides': overrides, 'seed': seed}
+        while ga.generation < generations:
+            ga.evolve()
+            stats = ga.get_statistics()
+            results.put(dict(base, generation=stats['generation'], best_fitness=stats['best_fitness'],
+                             avg_fitness=stats['avg_fitness'], min_fitness=stats['min_fitness'],
+                             elapsed_s=time.perf_counter() - start))
+        results.put(dict(base, finished=True, generations=generations, elapsed_s=time.perf_counter() - start))
+        ga.close()
+    finally:
+        apply_overrides(previous)
+
+def load_finished(path):
+    """Get the ids of finished runs and drop the records of unfinished ones from the results file"""
+    if not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    finished = {record['run'] for record in records if record.get('finished')}
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        for record in records:
+            if record['run'] in finished:
+                f.write(json.dumps(record) + "\n")
+    os.replace(tmp_path, path)
+    return finished
+
+def parse_value(text):
+    """Parse one override value as a Python literal, falling back to a string"""
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        return text
+
+def parse_grid(assignments):
+    """Turn NAME=v1,v2 assignments into a list of override dicts, one per grid point"""
+    names = []
+    values = []
+    for assignment in assignments:
+        name, _, text = assignment.partition('=')
+        if not text:
+            raise ValueError(f"Expected NAME=v1,v2,... but got {assignment!r}")
+        names.append(name)
+        values.append([parse_value(value) for value in text.split(',')])
+    return [dict(zip(names, point)) for point in itertools.product(*values)]
+
+def run_sweep(grid, seeds, generations, output, workers=None):
+    """Run every (overrides, seed) combination not finished in output, streaming records to it"""
+    finished = load_finished(output)
+    runs = [(overrides, seed) for overrides in grid for seed in seeds
+            if run_id(overrides, seed) not in finished]
+    print(f"{len(runs)} runs to do, {len(grid) * len(seeds) - len(runs)} already finished", file=sys.stderr)
+    if not runs:
+        return
+
+    context = multiprocessing.get_context(PARALLEL_START_METHOD)
+    with context.Manager() as manager, open(output, 'a') as f:
+        results = manager.Queue()
+        with ProcessPoolExecutor(max_workers=workers or PARALLEL_WORKERS or os.cpu_count(),
+                                 mp_context=context) as pool:
+            pending = {pool.submit(run_experiment, overrides, seed, generations, results)
+                       for overrides, seed in runs}
+            while pending:
+                try:
+                    record = results.get(timeout=0.2)
+                except queue.Empty:
+                    done, pending = wait(pending, timeout=0, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+                    continue
+                f.write(json.dumps(record) + "\n")
+                f.flush()
+                if record.get('finished'):
+                    print(f"Finished {record['run']} in {record['elapsed_s']:.1f}s", file=sys.stderr)
+
+        # Write what the last runs put on the queue before they returned
+        while not results.empty():
+            f.write(json.dumps(results.get()) + "\n")
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a grid of GA experiments in parallel")
+    parser.add_argument('--set', action='append', default=[], metavar='NAME=V1,V2',
+                        help="Config constant and the values to sweep over; may be repeated")
+    parser.add_argument('--seeds', nargs='+', type=int, default=[0])
+    parser.add_argument('--generations', type=int, default=100)
+    parser.add_argument('--workers', type=int, help="Concurrent runs (default PARALLEL_WORKERS or every core)")
+    parser.add_argument('--output', default='sweep.jsonl', help="Consolidated JSON lines results file")
+    args = parser.parse_args()
+
+    try:
+        grid = parse_grid(args.set)
+        for overrides in grid:
+            check_overrides(overrides)
+    except ValueError as error:
+        parser.error(str(error))
+    run_sweep(grid, args.seeds, args.generations, args.output, args.workers)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""Streaming per-generation statistics and their live plot.
+
+Usage:
+    python telemetry.py runs/seed1/statistics.csv [--interval 1.0]
+
+A StatsSink appends one record per generation to a JSON lines or CSV file:
+the GA statistics, quantiles of the generation's fitness distribution and
+timings. Writes are buffered and flushed at most every TELEMETRY_FLUSH_SECONDS,
+so a long run costs one small write per generation. The command follows such
+a file from a separate process, like tail -f, and appends every new record
+to a live matplotlib plot.
+"""
+import argparse
+import csv
+import json
+import os
+import time
+import numpy as np
+from config import *
+
+TELEMETRY_FORMATS = ('csv', 'jsonl')
+
+def quantile_name(q):
+    """Column name of a fitness quantile, e.g. 'q25' for 0.25"""
+    return f"q{round(q * 100):02d}"
+
+def _parse_value(text):
+    """Convert a CSV field back to an int or float where it holds one"""
+    for convert in (int, float):
+        try:
+            return convert(text)
+        except ValueError:
+            pass
+    return text
+
+class StatsReader:
+    """Incremental reader of a telemetry file that may still be growing.
+
+    poll() returns only the records completed since the previous call and
+    keeps a trailing partial line for the next one, so it can follow the
+    file of a running sink.
+    """
+    def __init__(self, path, fmt=None):
+        self.path = path
+        self.fmt = fmt or ('jsonl' if path.endswith('.jsonl') else 'csv')
+        self.offset = 0
+        self.partial = ''
+        self.fields = None
+
+    def poll(self):
+        """Read the records appended since the last call"""
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, newline='') as f:
+            if os.fstat(f.fileno()).st_size < self.offset:
+                # The file was rewritten, e.g. by a resumed run; start over
+                self.offset, self.partial, self.fields = 0, '', None
+            f.seek(self.offset)
+            data = f.read()
+            self.offset = f.tell()
+        lines = (self.partial + data).split('\n')
+        self.partial = lines.pop()
+
+        records = []
+        for line in lines:
+            if not line.strip():
+                continue
+            if self.fmt == 'jsonl':
+                records.append(json.loads(line))
+                continue
+            row = next(csv.reader([line]))
+            if self.fields is None:
+                self.fields = row
+            else:
+                records.append({name: _parse_value(value) for name, value in zip(self.fields, row)})
+        return records
+
+class StatsSink:
+    """Buffered append-only stream of per-generation statistics, as JSON lines or CSV rows.
+
+    A record holds the given statistics, the mean, standard deviation and
+    TELEMETRY_QUANTILES of the generation's fitnesses, the seconds since the
+    sink started and any timings passed in. CSV columns are fixed by the
+    first record. With start_generation > 0, the records of later generations
+    are dropped from an existing file, as a resumed run evolves them again.
+    """
+    def __init__(self, path, fmt=None, quantiles=None, flush_seconds=None, start_generation=0):
+        self.path = path
+        self.fmt = fmt or ('jsonl' if path.endswith('.jsonl') else 'csv')
+        if self.fmt not in TELEMETRY_FORMATS:
+            raise ValueError(f"Unknown telemetry format: {self.fmt}")
+        self.quantiles = TELEMETRY_QUANTILES if quantiles is None else quantiles
+        self.flush_seconds = TELEMETRY_FLUSH_SECONDS if flush_seconds is None else flush_seconds
+        self.start = time.perf_counter()
+        self.last_flush = self.start
+        self.writer = None
+
+        kept = []
+        if start_generation > 0:
+            kept = [record for record in StatsReader(path, self.fmt).poll()
+                    if record.get('generation', 0) <= start_generation]
+        self.file = open(path, 'w', newline='')
+        for record in kept:
+            self._write(record)
+        self.flush()
+
+    def _write(self, record):
+        if self.fmt == 'jsonl':
+            self.file.write(json.dumps(record) + "\n")
+            return
+        if self.writer is None:
+            self.writer = csv.DictWriter(self.file, fieldnames=list(record), extrasaction='ignore')
+            self.writer.writeheader()
+        self.writer.writerow(record)
+
+    def record(self, stats, fitnesses=None, timings=None):
+        """Append the record of one generation, returning it"""
+        record = dict(stats)
+        if fitnesses is not None and len(fitnesses):
+            fitnesses = np.asarray(fitnesses, dtype=np.float64)
+            record['mean_fitness'] = float(fitnesses.mean())
+            record['std_fitness'] = float(fitnesses.std())
+            for q, value in zip(self.quantiles, np.quantile(fitnesses, self.quantiles).tolist()):
+                record[quantile_name(q)] = value
+        record['elapsed_s'] = time.perf_counter() - self.start
+        record.update(timings or {})
+        self._write(record)
+        if time.perf_counter() - self.last_flush >= self.flush_seconds:
+            self.flush()
+        return record
+
+    def flush(self):
+        """Write the buffered records through to the file"""
+        self.file.flush()
+        self.last_flush = time.perf_counter()
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class LivePlot:
+    """Matplotlib figure of a telemetry stream that grows with every new record.
+
+    The lines are created once, when their key first shows up; extend()
+    appends the new points to their data and only rescales the axes, so each
+    update costs the same however long the run has been going.
+    """
+    FITNESS_LINES = (('best_fitness', 'Best'), ('avg_fitness', 'Average'), ('min_fitness', 'Minimum'))
+
+    def __init__(self, title=None):
+        import matplotlib.pyplot as plt
+        self.plt = plt
+        plt.ion()
+        self.figure, (self.fitness_axes, self.time_axes) = plt.subplots(1, 2, figsize=(12, 5))
+        self.figure.canvas.manager.set_window_title(title or 'Telemetry')
+        self.fitness_axes.set_xlabel('Generation')
+        self.fitness_axes.set_ylabel('Fitness')
+        self.fitness_axes.set_title('Fitness Evolution')
+        self.time_axes.set_xlabel('Generation')
+        self.time_axes.set_ylabel('Seconds')
+        self.time_axes.set_title('Generation Time')
+        self.data = {}  # Key -> (generations, values)
+        self.lines = {}
+        for key, label in self.FITNESS_LINES:
+            self._add_line(self.fitness_axes, key, label, '-')
+
+    def _add_line(self, axes, key, label, style):
+        self.lines[key], = axes.plot([], [], style, label=label)
+        self.data[key] = ([], [])
+        axes.legend(loc='best')
+
+    def _line_for(self, key):
+        """Create the line of a newly seen quantile or timing key"""
+        if key.startswith('q') and key[1:].isdigit():
+            # The median is dashed and the other quantiles dotted
+            self._add_line(self.fitness_axes, key, f"{int(key[1:])}th percentile", '--' if key == 'q50' else ':')
+        elif key.endswith('_s') and key != 'elapsed_s':
+            self._add_line(self.time_axes, key, key[:-2], '-')
+
+    def extend(self, records):
+        """Append records to the plot and redraw it once"""
+        if not records:
+            return
+        for record in records:
+            for key, value in record.items():
+                if key not in self.lines:
+                    self._line_for(key)
+                if key in self.lines and isinstance(value, (int, float)):
+                    generations, values = self.data[key]
+                    generations.append(record['generation'])
+                    values.append(value)
+        for key, line in self.lines.items():
+            line.set_data(*self.data[key])
+        for axes in (self.fitness_axes, self.time_axes):
+            axes.relim()
+            axes.autoscale_view()
+        self.figure.canvas.draw_idle()
+
+    def pause(self, seconds):
+        """Let the window process events for a while"""
+        self.plt.pause(seconds)
+
+    @property
+    def open(self):
+        return self.plt.fignum_exists(self.figure.number)
+
+def follow(path, interval=1.0, fmt=None):
+    """Plot a telemetry file live until its window is closed"""
+    reader = StatsReader(path, fmt)
+    plot = LivePlot(title=path)
+    while plot.open:
+        plot.extend(reader.poll())
+        plot.pause(interval)
+
+def main():
+    parser = argparse.ArgumentParser(description="Plot the statistics of a running or finished GA run live")
+    parser.add_argument('path', help="Telemetry file written by a headless run, e.g. <output>/statistics.csv")
+    parser.add_argument('--interval', type=float, default=1.0, help="Seconds between checks for new records")
+    parser.add_argument('--format', choices=TELEMETRY_FORMATS, help="File format (default: from the extension)")
+    args = parser.parse_args()
+    follow(args.path, args.interval, args.format)
+
+if __name__ == "__main__":
+    main()
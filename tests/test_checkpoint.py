@@ -0,0 +1,80 @@
+import random
+import numpy as np
+from config import *
+from checkpoint import GenerationArchive, load_checkpoint, save_checkpoint
+from environment import Environment
+from genetic import GeneticAlgorithm
+
+def _generation(generation, rows=4):
+    rng = np.random.default_rng(generation)
+    return rng.integers(0, 100, (rows, GENOME_LENGTH), dtype=np.uint8), rng.uniform(0, 1, rows)
+
+def test_resumed_run_continues_exactly(tmp_path):
+    path = str(tmp_path / 'checkpoint.npz')
+    random.seed(3)
+    ga = GeneticAlgorithm(population_size=12)
+    env = Environment(num_animats=3)
+    ga.initialize_population()
+    ga.evolve()
+    save_checkpoint(path, ga, env)
+    ga.evolve()
+    ga.evolve()
+
+    random.seed(99)
+    resumed = GeneticAlgorithm(population_size=12)
+    resumed_env = Environment(num_animats=3)
+    load_checkpoint(path, resumed, resumed_env)
+    assert resumed.generation == 1
+    for object_type in ('food_sources', 'water_sources', 'traps'):
+        assert np.array_equal(getattr(resumed_env, object_type), getattr(env, object_type))
+    resumed.evolve()
+    resumed.evolve()
+
+    assert np.array_equal(resumed.population, ga.population)
+    assert resumed.best_fitness_history == ga.best_fitness_history
+    assert resumed.avg_fitness_history == ga.avg_fitness_history
+    assert resumed.min_fitness_history == ga.min_fitness_history
+
+def test_archive_truncate_drops_later_generations(tmp_path):
+    archive = GenerationArchive(str(tmp_path))
+    for generation in range(1, 5):
+        archive.append(generation, *_generation(generation))
+    archive.truncate(3)
+
+    reopened = GenerationArchive(str(tmp_path))
+    assert reopened.index[:, 0].tolist() == [1, 2]
+    assert reopened.rows == 8
+    reopened.append(3, *_generation(30))
+    genomes, fitnesses = reopened.generation(3)
+    assert np.array_equal(genomes, _generation(30)[0])
+    assert np.array_equal(fitnesses, _generation(30)[1])
+
+def test_archive_ignores_rows_of_an_interrupted_append(tmp_path):
+    archive = GenerationArchive(str(tmp_path))
+    archive.append(1, *_generation(1))
+    # A crash after the data was written but before its index entry was complete
+    genomes, fitnesses = _generation(2)
+    with open(archive.genomes_path, 'ab') as f:
+        f.write(genomes.tobytes())
+    with open(archive.fitness_path, 'ab') as f:
+        f.write(fitnesses.tobytes())
+    with open(archive.index_path, 'ab') as f:
+        f.write(np.array([2, 4], dtype=np.int64).tobytes())
+
+    recovered = GenerationArchive(str(tmp_path))
+    assert len(recovered) == 1
+    assert recovered.rows == 4
+    recovered.append(2, *_generation(20))
+    assert np.array_equal(recovered.generation(2)[0], _generation(20)[0])
+    assert recovered.genomes().shape == (8, GENOME_LENGTH)
+
+def test_archive_memory_maps_every_generation(tmp_path):
+    archive = GenerationArchive(str(tmp_path))
+    for generation in range(1, 4):
+        archive.append(generation, *_generation(generation))
+
+    genomes, fitnesses = archive.genomes(), archive.fitnesses()
+    assert isinstance(genomes, np.memmap) and isinstance(fitnesses, np.memmap)
+    assert np.array_equal(genomes, np.concatenate([_generation(g)[0] for g in range(1, 4)]))
+    assert np.array_equal(fitnesses, np.concatenate([_generation(g)[1] for g in range(1, 4)]))
+    assert not genomes.flags.writeable
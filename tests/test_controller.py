@@ -0,0 +1,25 @@
+import numpy as np
+from config import *
+from controller import NUM_LINKS, CompiledController
+
+def test_stacked_controller_matches_single_genomes():
+    rng = np.random.default_rng(0)
+    genomes = rng.integers(0, 100, (50, GENOME_LENGTH), dtype=np.uint8)
+    sensors = rng.uniform(0, 120, (50, NUM_LINKS))
+    battery1 = rng.uniform(0, BATTERY_MAX, 50)
+    battery2 = rng.uniform(0, BATTERY_MAX, 50)
+
+    left, right = CompiledController(genomes).wheel_speeds(sensors, battery1, battery2)
+    for i, genome in enumerate(genomes):
+        single = CompiledController(genome).wheel_speeds(sensors[i].tolist(), battery1[i], battery2[i])
+        assert np.allclose(single, (left[i], right[i]), rtol=1e-9, atol=1e-12)
+
+def test_saturated_wheels_stay_finite():
+    genomes = np.zeros((2, GENOME_LENGTH), dtype=np.uint8)
+    genomes[1] = 99
+    sensors = np.full((2, NUM_LINKS), 100.0)
+    left, right = CompiledController(genomes).wheel_speeds(sensors, np.full(2, 200.0), np.full(2, 200.0))
+    for i, genome in enumerate(genomes):
+        single = CompiledController(genome).wheel_speeds(sensors[i].tolist(), 200.0, 200.0)
+        assert np.allclose(single, (left[i], right[i]))
+    assert np.all(np.abs(left) <= 1) and np.all(np.abs(right) <= 1)
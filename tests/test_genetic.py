@@ -0,0 +1,46 @@
+import random
+import numpy as np
+from config import *
+from genetic import GeneticAlgorithm, simulate_genome
+
+def test_halving_estimates_keep_their_rung_order_below_the_promoted():
+    random.seed(0)
+    ga = GeneticAlgorithm(population_size=40, backend='vectorized', halving_rungs=[100], layout_count=1, seed=1)
+    ga.initialize_population()
+    ga.layouts = ga.draw_layouts()
+    fitnesses = np.array(ga.evaluate_halving(ga.population))
+    estimated = np.array([ga.fitness_cache.key(genome) in ga.estimated for genome in ga.population])
+    assert estimated.any() and not estimated.all()
+
+    rung = np.array([simulate_genome(genome, 100, ga.layouts) for genome in ga.population[estimated]])
+    order = np.sign(rung[:, None] - rung[None, :])
+    assert np.array_equal(np.sign(fitnesses[estimated][:, None] - fitnesses[estimated][None, :]), order)
+    full = np.array([simulate_genome(genome, layouts=ga.layouts) for genome in ga.population[~estimated]])
+    assert np.allclose(fitnesses[~estimated], full, rtol=1e-9)
+    # Every promoted genome, at least ELITE_COUNT of them, ends at or above the best estimate
+    assert (full >= fitnesses[estimated].max()).sum() >= ELITE_COUNT
+
+def test_estimates_stay_out_of_the_average_and_minimum():
+    ga = GeneticAlgorithm(population_size=4)
+    ga.record_history(np.array([0.9, 0.2, 0.6, 0.4]), np.array([False, True, False, False]))
+    assert ga.best_fitness_history == [0.9]
+    assert np.isclose(ga.avg_fitness_history[0], (0.9 + 0.6 + 0.4) / 3)
+    assert ga.min_fitness_history == [0.4]
+    assert ga.estimated_history == [1]
+
+def test_surrogate_screens_only_once_it_beats_chance():
+    ga = GeneticAlgorithm(population_size=4, surrogate=True, seed=2)
+    rng = np.random.default_rng(3)
+    genomes = rng.integers(0, 100, (200, GENOME_LENGTH), dtype=np.uint8)
+    ga.surrogate.update(genomes, genomes[:, 0] / 99.0)
+    candidates = rng.integers(0, 100, (40, GENOME_LENGTH), dtype=np.uint8)
+
+    # With no measured accuracy yet the children are a random pick and nothing counts as screened
+    ga.screen_children(candidates, 10)
+    assert ga.screened_out == 0
+
+    ga.surrogate_accuracy = 0.9
+    chosen = ga.screen_children(candidates, 10)
+    assert ga.screened_out == 30
+    best = np.sort(candidates[:, 0])[-(10 - int(round(10 * SURROGATE_RANDOM_SHARE))):]
+    assert set(best.tolist()) <= set(chosen[:, 0].tolist())
@@ -0,0 +1,24 @@
+import random
+import numpy as np
+from config import *
+from genetic import simulate_genome
+from layouts import LayoutPool
+from simulation import PopulationSimulator
+
+def test_population_simulator_matches_serial_runs_on_layouts():
+    rng = np.random.default_rng(1)
+    genomes = rng.integers(0, 100, (6, GENOME_LENGTH), dtype=np.uint8)
+    layouts = LayoutPool([11, 12])
+    simulator = PopulationSimulator(np.repeat(genomes, len(layouts), axis=0), layouts=layouts,
+                                    layout_ids=np.tile(np.arange(len(layouts)), len(genomes)))
+    fitnesses = simulator.run().reshape(len(genomes), len(layouts)).mean(axis=1)
+    for genome, fitness in zip(genomes, fitnesses):
+        assert np.isclose(simulate_genome(genome, layouts=layouts), fitness, rtol=1e-9)
+
+def test_population_simulator_is_seeded_by_its_rng():
+    genomes = np.random.default_rng(2).integers(0, 100, (8, GENOME_LENGTH), dtype=np.uint8)
+    random.seed(0)
+    first = PopulationSimulator(genomes, rng=np.random.default_rng(3)).run(200)
+    second = PopulationSimulator(genomes, rng=np.random.default_rng(3)).run(200)
+    assert np.array_equal(first, second)
+    assert np.all((first >= 0) & (first <= 1))
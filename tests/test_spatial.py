@@ -0,0 +1,96 @@
+import math
+import random
+import numpy as np
+import pytest
+from config import *
+from animat import Animat
+from environment import Environment
+from spatial import NearestField, NeighborIndex
+
+def _brute_nearest(points, position):
+    distances = [math.hypot(x - position[0], y - position[1]) for x, y in points]
+    return int(np.argmin(distances)), min(distances)
+
+def test_nearest_field_agrees_with_brute_force_after_moves():
+    rng = random.Random(0)
+    size = 600
+    points = [(rng.uniform(10, size - 10), rng.uniform(10, size - 10)) for _ in range(12)]
+    field = NearestField(size, 6.0, 150, points)
+    for step in range(60):
+        item_id = rng.randrange(len(points))
+        points[item_id] = (rng.uniform(10, size - 10), rng.uniform(10, size - 10))
+        field.move(item_id, points[item_id])
+        for _ in range(50):
+            position = (rng.uniform(0, size), rng.uniform(0, size))
+            found = field.nearest(position)
+            if found is not None:
+                slot, distance = _brute_nearest(points, position)
+                assert found[0] == slot
+                assert found[1] == pytest.approx(distance, rel=1e-12)
+
+def test_nearest_field_copy_is_independent():
+    field = NearestField(200, 6.0, 150, [(50.0, 50.0), (150.0, 150.0)])
+    copy = field.copy()
+    copy.move(0, (160.0, 150.0))
+    assert field.nearest((52.0, 50.0))[0] == 0
+    assert field.points[0] == (50.0, 50.0)
+
+def test_environment_batch_queries_match_single_queries():
+    random.seed(4)
+    env = Environment(20)
+    positions = [(random.uniform(0, env.size), random.uniform(0, env.size)) for _ in range(300)]
+    positions += [tuple(env.food_sources[0] + 3.0)]
+    for obj_type in ('food', 'water', 'trap'):
+        slots, distances, dx, dy = env.nearest_objects(positions, obj_type)
+        collisions = env.collision_slots(positions, obj_type)
+        for k, position in enumerate(positions):
+            nearest, distance = env.get_nearest_object(position, obj_type)
+            assert np.array_equal(env._get_objects(obj_type)[slots[k]], nearest)
+            assert distances[k] == pytest.approx(distance, rel=1e-12)
+            assert (collisions[k] >= 0) == (env.collision_slot(position, obj_type) is not None)
+
+def _animats(count, extent, seed):
+    rng = random.Random(seed)
+    animats = []
+    for _ in range(count):
+        animat = Animat(position=(rng.uniform(0, extent), rng.uniform(0, extent)))
+        animat.angle = rng.uniform(0, 2 * math.pi)
+        animat.alive = rng.random() < 0.9
+        animats.append(animat)
+    return animats
+
+def _brute_by_side(animats, animat, max_distance):
+    best = [None, None]
+    for other in animats:
+        if other is animat or not other.alive:
+            continue
+        dx = other.position[0] - animat.position[0]
+        dy = other.position[1] - animat.position[1]
+        distance = math.hypot(dx, dy)
+        side = 0 if (math.atan2(dy, dx) - animat.angle) % (2 * math.pi) < math.pi else 1
+        if distance < max_distance and (best[side] is None or distance < best[side]):
+            best[side] = distance
+    return best
+
+@pytest.mark.parametrize('count', [1, 2, 40, 300])
+def test_neighbor_index_agrees_with_brute_force(count):
+    animats = _animats(count, 30 * math.sqrt(count), count)
+    neighbors = NeighborIndex(animats)
+    max_distance = 60.0
+    rows = [i for i, animat in enumerate(animats) if animat.alive]
+    left, right = neighbors.nearest_by_side_batch(rows, [animats[i].position for i in rows],
+                                                  [animats[i].angle for i in rows], max_distance)
+    for k, i in enumerate(rows):
+        expected = _brute_by_side(animats, animats[i], max_distance)
+        for found, batch, reference in zip(neighbors.nearest_by_side(animats[i], max_distance),
+                                           (left[k], right[k]), expected):
+            if reference is None:
+                assert found is None and np.isnan(batch)
+            else:
+                assert found == pytest.approx(reference, rel=1e-12)
+                assert batch == pytest.approx(reference, rel=1e-12)
+
+    pairs = sorted(map(tuple, neighbors.colliding_pairs(ANIMAT_SIZE * 2).tolist()))
+    expected = sorted((i, j) for i in rows for j in rows if i < j and
+                      math.dist(animats[i].position, animats[j].position) < ANIMAT_SIZE * 2)
+    assert pairs == expected
@@ -0,0 +1,20 @@
+import pytest
+import config
+import layouts
+from sweep import apply_overrides, check_overrides
+
+def test_overrides_recompute_derived_constants():
+    previous = apply_overrides({'ANIMAT_MAX_LIFESPAN': 100, 'BASE_TRAP_COUNT': 5})
+    try:
+        assert config.TRAJECTORY_CAPACITY == 101
+        assert layouts.TURN_COUNT == 100 // (config.STUCK_THRESHOLD + 1) + 1
+        assert layouts.OBJECT_COUNTS['trap'] == 5
+    finally:
+        apply_overrides(previous)
+    assert config.TRAJECTORY_CAPACITY == config.ANIMAT_MAX_LIFESPAN + 1
+    assert layouts.OBJECT_COUNTS['trap'] == config.BASE_TRAP_COUNT
+
+@pytest.mark.parametrize('name', ['FPS', 'TURN_COUNT', 'GENOME_LENGTH', 'NOT_A_CONSTANT'])
+def test_derived_fixed_and_unknown_constants_are_rejected(name):
+    with pytest.raises(ValueError):
+        check_overrides({name: 1})
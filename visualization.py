@@ -2,48 +2,98 @@ import pygame
 import numpy as np
 import matplotlib.pyplot as plt
 from config import *
+from profiling import profiler
 
 class Visualizer:
     def __init__(self, env_size):
         pygame.init()
-        self.screen = pygame.display.set_mode((env_size, env_size))
+        # Large worlds are drawn scaled down to fit a MAX_WINDOW_SIZE window
+        self.scale = min(1.0, MAX_WINDOW_SIZE / env_size)
+        window_size = int(env_size * self.scale)
+        self.screen = pygame.display.set_mode((window_size, window_size))
+        # Cached food, water and trap layer, redrawn only when env.version changes
+        self.background = pygame.Surface((window_size, window_size))
+        self.background_env = None
+        self.background_version = None
+        self.dirty = []  # Screen areas drawn over the background in the last frame
         pygame.display.set_caption(WINDOW_TITLE)
         self.clock = pygame.time.Clock()
         self.font = pygame.font.Font(None, 36)
+        self.running = True
+    
+    def handle_events(self):
+        """Process pending window events, returning False once the user has asked to quit"""
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                self.running = False
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_ESCAPE:
+                    self.running = False
+        return self.running
+    
+    def to_screen(self, position):
+        """Convert a world position to integer window coordinates"""
+        return int(position[0] * self.scale), int(position[1] * self.scale)
     
     def draw_environment(self, env, animats):
         """Draw the environment and all objects"""
-        self.screen.fill(COLORS['BLACK'])
+        with profiler.phase('render'):
+            self._draw_environment(env, animats)
+        with profiler.phase('render.fps_wait'):
+            self.clock.tick(FPS)
+    
+    def _render_background(self, env):
+        """Pre-render the food, water and trap layer of env to the background surface"""
+        self.background.fill(COLORS['BLACK'])
+        source_size = max(1, int(SOURCE_SIZE * self.scale))
         
         # Draw food sources
         for pos in env.food_sources:
-            pygame.draw.circle(self.screen, COLORS['GREEN'], 
-                             (int(pos[0]), int(pos[1])), SOURCE_SIZE)
+            pygame.draw.circle(self.background, COLORS['GREEN'], self.to_screen(pos), source_size)
         
         # Draw water sources
         for pos in env.water_sources:
-            pygame.draw.circle(self.screen, COLORS['BLUE'], 
-                             (int(pos[0]), int(pos[1])), SOURCE_SIZE)
+            pygame.draw.circle(self.background, COLORS['BLUE'], self.to_screen(pos), source_size)
         
         # Draw traps
         for pos in env.traps:
-            pygame.draw.circle(self.screen, COLORS['RED'], 
-                             (int(pos[0]), int(pos[1])), SOURCE_SIZE)
+            pygame.draw.circle(self.background, COLORS['RED'], self.to_screen(pos), source_size)
+        
+        self.background_env = env
+        self.background_version = env.version
+    
+    def _draw_environment(self, env, animats):
+        # Objects only change when one is consumed, so the cached layer is redrawn only then
+        full_redraw = self.background_env is not env or self.background_version != env.version
+        if full_redraw:
+            self._render_background(env)
+            self.screen.blit(self.background, (0, 0))
+        else:
+            # Erase the previous frame's animats by restoring the background under them
+            for rect in self.dirty:
+                self.screen.blit(self.background, rect, rect)
+        previous = self.dirty
+        self.dirty = []
+        
+        scale = self.scale
+        animat_size = max(1, int(ANIMAT_SIZE * scale))
         
         # Draw animats
         for animat in animats:
             if animat.alive:
                 # Draw animat body
-                pygame.draw.circle(self.screen, COLORS['WHITE'], 
-                                 (int(animat.position[0]), int(animat.position[1])), 
-                                 ANIMAT_SIZE)
+                center = self.to_screen(animat.position)
+                self.dirty.append(pygame.draw.circle(self.screen, COLORS['WHITE'], center, animat_size))
                 
                 # Draw direction indicator
                 end_x = animat.position[0] + np.cos(animat.angle) * ANIMAT_SIZE * 1.5
                 end_y = animat.position[1] + np.sin(animat.angle) * ANIMAT_SIZE * 1.5
-                pygame.draw.line(self.screen, COLORS['YELLOW'],
-                               (int(animat.position[0]), int(animat.position[1])),
-                               (int(end_x), int(end_y)), 2)
+                self.dirty.append(pygame.draw.line(self.screen, COLORS['YELLOW'], center,
+                                                   self.to_screen((end_x, end_y)), 2))
+                
+                # Battery bars are only legible at full scale
+                if scale < 1:
+                    continue
                 
                 # Draw battery levels
                 battery_width = 20
@@ -54,27 +104,32 @@ class Visualizer:
                 # Food battery
                 pygame.draw.rect(self.screen, COLORS['GREEN'],
                                (x, y, battery_width * (animat.battery1/BATTERY_MAX), battery_height))
-                pygame.draw.rect(self.screen, COLORS['WHITE'],
-                               (x, y, battery_width, battery_height), 1)
+                self.dirty.append(pygame.draw.rect(self.screen, COLORS['WHITE'],
+                                                   (x, y, battery_width, battery_height), 1))
                 
                 # Water battery
                 y += battery_height + 2
                 pygame.draw.rect(self.screen, COLORS['BLUE'],
                                (x, y, battery_width * (animat.battery2/BATTERY_MAX), battery_height))
-                pygame.draw.rect(self.screen, COLORS['WHITE'],
-                               (x, y, battery_width, battery_height), 1)
+                self.dirty.append(pygame.draw.rect(self.screen, COLORS['WHITE'],
+                                                   (x, y, battery_width, battery_height), 1))
         
-        pygame.display.flip()
-        self.clock.tick(FPS)
+        if full_redraw:
+            pygame.display.flip()
+        else:
+            # Only the areas animats left or moved into have changed
+            pygame.display.update(previous + self.dirty)
     
     def draw_trajectory(self, animat):
         """Draw the trajectory of an animat"""
-        if len(animat.trajectory) < 2:
+        if animat.trajectory is None or len(animat.trajectory) < 2:
             return
         
-        points = [(int(x), int(y)) for x, y in animat.trajectory]
-        pygame.draw.lines(self.screen, COLORS['CYAN'], False, points, 1)
-        pygame.display.flip()
+        points = [self.to_screen(point) for point in animat.trajectory.points()]
+        rect = pygame.draw.lines(self.screen, COLORS['CYAN'], False, points, 1)
+        # Erased with the animats on the next frame
+        self.dirty.append(rect)
+        pygame.display.update(rect)
     
     def plot_statistics(self, ga):
         """Plot fitness statistics using matplotlib"""
@@ -90,30 +145,38 @@ class Visualizer:
         plt.title('Fitness Evolution')
         plt.legend()
         
-        # Plot trajectory of best individual
+        # Plot the run that earned the best individual its fitness
         plt.subplot(1, 2, 2)
-        best_genome = ga.get_best_individual()
-        from animat import Animat
-        from environment import Environment
-        
-        env = Environment()
-        animat = Animat(genome=best_genome)
-        trajectory = []
+        log = ga.best_log
+        if log is None:
+            # Without recorded runs, the best genome is simulated once more in a fresh world
+            from genetic import FitnessRun
+            from replay import SimulationLog
+            log = SimulationLog()
+            FitnessRun(ga.get_best_individual(), log).advance(ANIMAT_MAX_LIFESPAN)
+        self._plot_log(log)
         
-        while animat.alive and len(trajectory) < ANIMAT_MAX_LIFESPAN:
-            animat.update(env)
-            trajectory.append(animat.position)
-        
-        trajectory = np.array(trajectory)
+        plt.tight_layout()
+        plt.show()
+    
+    @staticmethod
+    def plot_run(log):
+        """Plot a recorded run on its own"""
+        plt.figure(figsize=(6, 6))
+        Visualizer._plot_log(log)
+        plt.tight_layout()
+        plt.show()
+    
+    @staticmethod
+    def _plot_log(log):
+        """Plot the trajectory of a recorded run over the objects as they were at its end"""
+        trajectory = log.positions()
+        objects = log.objects_at(len(log) - 1)
         
         # Plot food, water, and trap objects
-        food_x, food_y = zip(*env.food_sources) if env.food_sources else ([], [])
-        water_x, water_y = zip(*env.water_sources) if env.water_sources else ([], [])
-        trap_x, trap_y = zip(*env.traps) if env.traps else ([], [])
-        
-        plt.scatter(food_x, food_y, c='lime', marker='o', s=80, label='Food')
-        plt.scatter(water_x, water_y, c='deepskyblue', marker='o', s=80, label='Water')
-        plt.scatter(trap_x, trap_y, c='red', marker='x', s=80, label='Trap')
+        plt.scatter(objects['food'][:, 0], objects['food'][:, 1], c='lime', marker='o', s=80, label='Food')
+        plt.scatter(objects['water'][:, 0], objects['water'][:, 1], c='deepskyblue', marker='o', s=80, label='Water')
+        plt.scatter(objects['trap'][:, 0], objects['trap'][:, 1], c='red', marker='x', s=80, label='Trap')
         
         plt.plot(trajectory[:, 0], trajectory[:, 1], 'b-', alpha=0.5, label='Trajectory')
         plt.scatter(trajectory[0, 0], trajectory[0, 1], c='g', label='Start')
@@ -122,9 +185,13 @@ class Visualizer:
         plt.ylabel('Y Position')
         plt.title('Best Individual Trajectory')
         plt.legend()
-        
-        plt.tight_layout()
-        plt.show()
+    
+    def replay(self, log):
+        """Animate a recorded run, one logged step per frame, until it ends or the window is closed"""
+        for world, animat in log.frames():
+            self.draw_environment(world, [animat])
+            if not self.handle_events():
+                break
     
     def close(self):
         """Close the pygame window"""